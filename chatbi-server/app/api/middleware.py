@@ -0,0 +1,114 @@
+import time
+from starlette.datastructures import MutableHeaders
+from app.services.serialization import StreamCompressor, negotiate_encoding, zstd_available
+from app.services.tracing import (
+    tracer, parse_traceparent, start_request_timings, format_server_timing
+)
+
+
+class TimingMiddleware:
+    """ASGI middleware that opens a request span and emits a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        timings = start_request_timings()
+        start_time = time.perf_counter()
+
+        with tracer.span(
+            f"{scope['method']} {scope['path']}",
+            parent=parent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as span:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    timings["total"] = round((time.perf_counter() - start_time) * 1000, 3)
+                    response_headers = list(message.get("headers", []))
+                    response_headers.append((b"server-timing", format_server_timing(timings).encode("latin-1")))
+                    response_headers.append((b"traceparent", span.traceparent.encode("latin-1")))
+                    message = {**message, "headers": response_headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "text/",
+    "application/javascript", "application/xml",
+)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses with zstd or gzip, as negotiated via Accept-Encoding
+
+    Small bodies are sent as-is; streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+        self.supported = ("zstd", "gzip") if zstd_available() else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"), self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                response_headers = MutableHeaders(raw=list(start_message["headers"]))
+                content_type = response_headers.get("content-type", "")
+                if (
+                    start_message["status"] in (204, 304)
+                    or "content-encoding" in response_headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding, self.levels[encoding])
+                response_headers["content-encoding"] = encoding
+                response_headers.add_vary_header("Accept-Encoding")
+                body = compressor.compress(body, final=not more_body)
+                if more_body:
+                    del response_headers["content-length"]
+                else:
+                    response_headers["content-length"] = str(len(body))
+                await send({**start_message, "headers": response_headers.raw})
+                await send({**message, "body": body})
+                return
+
+            await send({**message, "body": compressor.compress(body, final=not more_body)})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,10 @@
+from typing import Any
+from fastapi.responses import JSONResponse
+from app.services.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; accepts Decimal/datetime values as-is"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,47 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 import time
 
 from app.models.database import get_db, QueryHistory, DatabaseSchema
 from app.models.schemas import (
     QueryRequest, QueryResponse, DatabaseSchemaInfo, 
-    ErrorResponse, HealthResponse
+    ErrorResponse, HealthResponse, DataSourceInfo, MaterializedAnswerInfo, MaterializedAnswerUpdate,
+    ResultPage, RefreshRequest
 )
 from app.services.sql_generator import sql_generator
-from app.services.sql_executor import sql_executor
-from app.services.ollama_service import ollama_service
+from app.services.sql_executor import sql_executor, encode_cursor, decode_cursor
+from app.services.health import health_monitor
+from app.services.answer_materializer import answer_materializer, fresh_as_of
+from app.api.responses import FastJSONResponse
+from app.services.metrics import stage_timer, record_error, record_generation_outcome, QUERY_TOTAL_SECONDS
+from app.services.tracing import tracer, get_request_timings
+from app.services.shared_state import shared_store
+from app.services.rate_limit import rate_limiter, RateLimitExceeded
+from app.services.result_diff import result_etag, row_delta
+from app.services.speculation import SpeculativeExecution
+from app.services.serialization import to_jsonable
+from app.services.datasource import datasource_manager
+from app.services.result_export import EXPORT_FORMATS, encode_batches, parquet_available
+from config.settings import settings
 
 router = APIRouter()
 
+def resolve_datasource(datasource: Optional[str]) -> str:
+    """Map an optional datasource name to a configured one, or fail with 400"""
+    try:
+        return datasource_manager.resolve(datasource)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+def rate_limit_client(http_request: Request) -> Optional[str]:
+    """Rate limit bucket owner for the request (API key or client IP); None when limiting is off"""
+    host = http_request.client.host if http_request.client else None
+    return rate_limiter.client_key(http_request.headers, host)
+
+async def enforce_rate_limit(client: Optional[str], resources: tuple, take: tuple = ()) -> Dict[str, float]:
+    """The client's balances; fails with 429 and Retry-After when it has used up any of the resources
+
+    One token of each resource in `take` is taken up front (see RateLimiter.check).
+    """
+    if client is None:
+        return {}
+    try:
+        if rate_limiter.blocking:
+            return await run_in_threadpool(rate_limiter.check, client, resources, take)
+        return rate_limiter.check(client, resources, take)
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers=e.headers)
+
+async def charge_rate_limit(client: Optional[str], balances: Dict[str, float], usage: Dict[str, float]) -> None:
+    """Charge what a request used, keeping `balances` current for its response headers"""
+    if client is None:
+        return
+    if rate_limiter.blocking:
+        await run_in_threadpool(rate_limiter.charge, client, usage, balances)
+    else:
+        rate_limiter.charge(client, usage, balances)
+
+async def refund_rate_limit(client: Optional[str], balances: Dict[str, float], usage: Dict[str, float]) -> None:
+    """Hand back tokens taken at admission that the request did not use"""
+    if client is None:
+        return
+    if rate_limiter.blocking:
+        await run_in_threadpool(rate_limiter.refund, client, usage, balances)
+    else:
+        rate_limiter.refund(client, usage, balances)
+
+def query_response_content(record: QueryHistory, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """QueryResponse fields as a plain dict
+
+    Rows come from our own executor or history table, so they are encoded
+    directly by FastJSONResponse instead of being re-validated by Pydantic.
+    """
+    return {
+        "id": record.id,
+        "natural_language_query": record.natural_language_query,
+        "generated_sql": record.generated_sql,
+        "execution_result": record.execution_result,
+        "execution_time": record.execution_time,
+        "status": record.status,
+        "created_at": record.created_at,
+        "datasource": record.datasource,
+        "result_etag": record.result_etag,
+        "sample_rate": record.sample_rate,
+        "timings": timings,
+    }
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
-    ollama_status = await ollama_service.check_health()
-    db_status = await sql_executor.test_connection()
-    
-    status_text = "healthy" if ollama_status and db_status else "unhealthy"
+    """Health check endpoint, served from the latest background probes"""
+    status_text = "healthy" if health_monitor.is_ready() else "unhealthy"
     
     return HealthResponse(
         status=status_text,
-        timestamp=datetime.utcnow()
+        timestamp=datetime.utcnow(),
+        checks=health_monitor.checks()
+    )
+
+@router.get("/health/live")
+async def liveness():
+    """Liveness: the process is up and its event loop is responsive"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness():
+    """Readiness: every dependency passed its latest probe; 503 otherwise"""
+    ready = health_monitor.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if ready else "not_ready"}
     )
 
 @router.post("/query", response_model=QueryResponse)
 async def generate_sql_query(
     request: QueryRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: Optional[str] = Depends(rate_limit_client)
 ):
     """Generate SQL from natural language query"""
+    start_time = time.time()
+    query_status = "error"
+    current_stage = "generate"
+    datasource = resolve_datasource(request.datasource)
+    speculation: Optional[SpeculativeExecution] = None
+    balances: Dict[str, float] = {}
     try:
-        start_time = time.time()
+        # Frequently asked questions may already have a fresh precomputed answer
+        answer = None
+        if request.execute and settings.materialize_answers:
+            current_stage = "materialized_lookup"
+            with stage_timer("materialized_lookup"):
+                answer = answer_materializer.lookup(db, datasource, request.query, request.max_staleness)
         
         # Generate SQL
-        generated_sql = await sql_generator.generate_sql(request.query, db)
+        current_stage = "generate"
+        generation: Dict[str, Any] = {}
+        if answer is not None:
+            generated_sql = answer.generated_sql
+        else:
+            # Precomputed answers are free; anything else needs LLM (and DB) budget left. The
+            # generation token is taken now so concurrent requests cannot all pass on the last one
+            balances = await enforce_rate_limit(client, ("db_ms", "rows") if request.execute else (), take=("llm",))
+            if request.execute and settings.speculative_execution:
+                # Start executing once the streamed statement is complete, while the model finishes
+                speculation = SpeculativeExecution(
+                    lambda sql: sql_executor.execute_page(
+                        sql, settings.query_page_size, datasource=datasource, sample_rate=request.sample_rate
+                    ),
+                    # A discarded run still used the database
+                    lambda result: charge_rate_limit(client, balances, {"db_ms": result.get("execution_time") or 0})
+                )
+            try:
+                generated_sql = await sql_generator.generate_sql(
+                    request.query, db, datasource, generation,
+                    on_statement=speculation.start if speculation is not None else None
+                )
+            finally:
+                if generation.get("source") != "llm":
+                    # SQL cache hit, or failed before reaching the model
+                    await refund_rate_limit(client, balances, {"llm": 1})
         
         # Validate SQL
-        if not sql_generator.validate_sql(generated_sql):
+        current_stage = "validation"
+        with stage_timer("validation"):
+            is_valid = sql_generator.validate_sql(generated_sql)
+        if not is_valid:
+            record_error("validation", error_type="validation_failed")
+            record_generation_outcome(generation, "invalid")
             raise HTTPException(
                 status_code=400,
                 detail="Generated SQL failed validation"
@@ -50,52 +183,95 @@ async def generate_sql_query(
         execution_result = None
         execution_time = None
         query_status = "generated"
+        paging = {"total_rows": None, "total_rows_kind": None, "next_cursor": None, "sample_rate": None}
         
         # Execute SQL if requested
-        if request.execute:
-            exec_result = await sql_executor.execute_query(generated_sql)
+        if answer is not None:
+            execution_result = answer.execution_result
+            # Not "executed": served answers must not feed answer mining or few-shot examples
+            query_status = "materialized"
+        elif request.execute:
+            current_stage = "db_execute"
+            with stage_timer("db_execute"):
+                exec_result = await speculation.result(generated_sql) if speculation is not None else None
+                if exec_result is None:
+                    exec_result = await sql_executor.execute_page(
+                        generated_sql, settings.query_page_size, datasource=datasource, sample_rate=request.sample_rate
+                    )
+            await charge_rate_limit(client, balances, {
+                "db_ms": exec_result.get("execution_time") or 0,
+                "rows": len(exec_result.get("data") or []) if exec_result["success"] else 0
+            })
             if exec_result["success"]:
                 execution_result = exec_result.get("data", [])
                 execution_time = exec_result["execution_time"]
+                if exec_result.get("next_offset") is not None:
+                    paging["next_cursor"] = encode_cursor(generated_sql, exec_result["next_offset"])
+                paging.update(
+                    total_rows=exec_result.get("total_rows"),
+                    total_rows_kind=exec_result.get("total_rows_kind"),
+                    sample_rate=exec_result.get("sample_rate")
+                )
                 query_status = "executed"
+                record_generation_outcome(generation, "executed")
             else:
                 query_status = "error"
+                record_error("db_execute", error_type="execution_failed")
+                record_generation_outcome(generation, "execution_error")
                 raise HTTPException(
                     status_code=400,
                     detail=f"SQL execution failed: {exec_result['error']}"
                 )
         
+        if not request.execute:
+            record_generation_outcome(generation, "valid")
+        
         total_time = int((time.time() - start_time) * 1000)
         
         # Save to history
-        history_record = QueryHistory(
-            natural_language_query=request.query,
-            generated_sql=generated_sql,
-            execution_result=execution_result,
-            execution_time=execution_time or total_time,
-            status=query_status
-        )
-        db.add(history_record)
-        db.commit()
-        db.refresh(history_record)
-        
-        return QueryResponse(
-            id=history_record.id,
-            natural_language_query=request.query,
-            generated_sql=generated_sql,
-            execution_result=execution_result,
-            execution_time=execution_time or total_time,
-            status=query_status,
-            created_at=history_record.created_at
-        )
+        current_stage = "history_write"
+        with stage_timer("history_write"):
+            history_record = QueryHistory(
+                natural_language_query=request.query,
+                generated_sql=generated_sql,
+                execution_result=execution_result,
+                execution_time=execution_time or total_time,
+                status=query_status,
+                created_at=datetime.utcnow(),
+                datasource=datasource,
+                result_etag=result_etag(execution_result),
+                sample_rate=paging["sample_rate"]
+            )
+            db.add(history_record)
+            # Flush for the id and keep this snapshot: a refresh after commit
+            # would read the whole JSON result back from the database
+            db.flush()
+            content = query_response_content(history_record)
+            db.commit()
+        
+        with stage_timer("response_encode"):
+            response = FastJSONResponse(content={
+                **content,
+                **paging,
+                "timings": get_request_timings(),
+                "materialized_at": fresh_as_of(answer) if answer is not None else None
+            }, headers=rate_limiter.headers(client, balances))
+        return response
         
     except HTTPException:
+        query_status = "error"
         raise
     except Exception as e:
+        query_status = "error"
+        record_error(current_stage, e)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
+    finally:
+        if speculation is not None:
+            await speculation.discard()
+        QUERY_TOTAL_SECONDS.observe(time.time() - start_time, status=query_status)
 
 @router.get("/history", response_model=List[QueryResponse])
 async def get_query_history(
@@ -111,24 +287,176 @@ async def get_query_history(
                    .limit(limit)\
                    .all()
         
-        return [
-            QueryResponse(
-                id=record.id,
-                natural_language_query=record.natural_language_query,
-                generated_sql=record.generated_sql,
-                execution_result=record.execution_result,
-                execution_time=record.execution_time,
-                status=record.status,
-                created_at=record.created_at
-            )
-            for record in history
-        ]
+        return FastJSONResponse(content=[query_response_content(record) for record in history])
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch history: {str(e)}"
         )
 
+@router.get("/query/{query_id}/export")
+async def export_query_result(
+    query_id: int,
+    format: str = Query("csv", pattern="^(csv|parquet|jsonl)$"),
+    db: Session = Depends(get_db),
+    client: Optional[str] = Depends(rate_limit_client)
+):
+    """Re-execute a history entry's SQL without the preview limit and stream the full result"""
+    record = db.query(QueryHistory).filter(QueryHistory.id == query_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Query not found")
+    
+    sql = record.generated_sql
+    if not sql.lower().strip().startswith('select') or not sql_generator.validate_sql(sql):
+        raise HTTPException(status_code=400, detail="Only valid SELECT queries can be exported")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+    balances = await enforce_rate_limit(client, ("db_ms", "rows"))
+    
+    batches = sql_executor.stream_query(
+        sql, batch_size=settings.export_batch_size, datasource=record.datasource
+    )
+    fetch_seconds = 0.0
+    
+    def fetch():
+        # Only time spent pulling rows from the cursor counts as DB time, not the client's download
+        nonlocal fetch_seconds
+        started = time.perf_counter()
+        try:
+            return next(batches, None)
+        finally:
+            fetch_seconds += time.perf_counter() - started
+    
+    try:
+        # Run the query and fetch the first batch before committing to a 200 response
+        first_batch = await run_in_threadpool(fetch)
+    except Exception as e:
+        batches.close()
+        raise HTTPException(status_code=400, detail=f"SQL execution failed: {str(e)}")
+    
+    def all_batches():
+        # Iterated in the threadpool by StreamingResponse, so the blocking charge below is fine
+        batch, rows = first_batch, 0
+        try:
+            while batch is not None:
+                rows += len(batch[1])
+                yield batch
+                batch = fetch()
+        finally:
+            batches.close()
+            # Charged once the stream ends, however it ends
+            rate_limiter.charge(client, {"db_ms": fetch_seconds * 1000, "rows": rows})
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        encode_batches(format, all_batches()),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="query_{query_id}.{extension}"',
+            **rate_limiter.headers(client, balances)
+        }
+    )
+
+@router.get("/query/{query_id}/rows", response_model=ResultPage)
+async def get_result_page(
+    query_id: int,
+    cursor: str,
+    page_size: int = Query(None, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    client: Optional[str] = Depends(rate_limit_client)
+):
+    """Next page of a history entry's result, re-executed from the offset in the cursor"""
+    record = db.query(QueryHistory).filter(QueryHistory.id == query_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Query not found")
+    
+    sql = record.generated_sql
+    try:
+        offset = decode_cursor(cursor, sql)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not sql.lower().strip().startswith('select') or not sql_generator.validate_sql(sql):
+        raise HTTPException(status_code=400, detail="Only valid SELECT queries can be paged")
+    balances = await enforce_rate_limit(client, ("db_ms", "rows"))
+    
+    page_size = page_size or settings.query_page_size
+    result = await sql_executor.execute_page(
+        sql, page_size, offset=offset, datasource=record.datasource, estimate_total=False
+    )
+    await charge_rate_limit(client, balances, {
+        "db_ms": result.get("execution_time") or 0,
+        "rows": len(result["data"]) if result["success"] else 0
+    })
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=f"SQL execution failed: {result['error']}")
+    
+    next_offset = result.get("next_offset")
+    return FastJSONResponse(content={
+        "rows": result["data"],
+        "offset": offset,
+        "next_cursor": encode_cursor(sql, next_offset) if next_offset is not None else None
+    }, headers=rate_limiter.headers(client, balances))
+
+@router.post("/query/{query_id}/refresh", response_model=QueryResponse, responses={204: {"description": "Result unchanged"}})
+async def refresh_query_result(
+    query_id: int,
+    refresh: Optional[RefreshRequest] = None,
+    db: Session = Depends(get_db),
+    client: Optional[str] = Depends(rate_limit_client)
+):
+    """Re-execute a history entry, store the new result and send it only as far as it changed
+    
+    If the client's etag matches the new result, the response is a 204. If it
+    is the ETag of the result stored with the entry, the response holds a row
+    delta against that result instead of execution_result (when the delta is
+    smaller).
+    """
+    refresh = refresh or RefreshRequest()
+    record = db.query(QueryHistory).filter(QueryHistory.id == query_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Query not found")
+    
+    sql = record.generated_sql
+    if not sql.lower().strip().startswith('select') or not sql_generator.validate_sql(sql):
+        raise HTTPException(status_code=400, detail="Only valid SELECT queries can be refreshed")
+    if record.sample_rate:
+        # Re-running it unsampled would replace the stored sample with a different kind of result
+        raise HTTPException(status_code=400, detail="Sampled results cannot be refreshed")
+    balances = await enforce_rate_limit(client, ("db_ms", "rows"))
+    
+    result = await sql_executor.execute_page(
+        sql, settings.query_page_size, datasource=record.datasource, estimate_total=False
+    )
+    await charge_rate_limit(client, balances, {"db_ms": result.get("execution_time") or 0})
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=f"SQL execution failed: {result['error']}")
+    
+    rows = to_jsonable(result["data"])
+    etag = result_etag(rows)
+    base_etag, base_rows = record.result_etag, record.execution_result or []
+    if etag != base_etag:
+        record.execution_result = rows
+        record.result_etag = etag
+        record.status = "executed"
+    record.execution_time = result["execution_time"]
+    content = query_response_content(record)
+    db.commit()
+    
+    if refresh.etag == etag:
+        return Response(
+            status_code=status.HTTP_204_NO_CONTENT,
+            headers={"ETag": f'"{etag}"', **rate_limiter.headers(client, balances)}
+        )
+    
+    changes = row_delta(base_rows, rows) if refresh.delta and refresh.etag == base_etag else None
+    content["delta"] = None
+    if changes is not None:
+        content.update(execution_result=None, delta={"base_etag": base_etag, **changes})
+    await charge_rate_limit(client, balances, {"rows": len(changes["changes"]) if changes is not None else len(rows)})
+    next_offset = result.get("next_offset")
+    content["next_cursor"] = encode_cursor(sql, next_offset) if next_offset is not None else None
+    return FastJSONResponse(content=content, headers={"ETag": f'"{etag}"', **rate_limiter.headers(client, balances)})
+
 @router.delete("/history/{query_id}")
 async def delete_query_history(
     query_id: int,
@@ -153,10 +481,11 @@ async def delete_query_history(
         )
 
 @router.get("/schema", response_model=List[DatabaseSchemaInfo])
-async def get_database_schema(db: Session = Depends(get_db)):
+async def get_database_schema(datasource: Optional[str] = None, db: Session = Depends(get_db)):
     """Get database schema information"""
+    datasource = resolve_datasource(datasource)
     try:
-        schema_records = db.query(DatabaseSchema).all()
+        schema_records = db.query(DatabaseSchema).filter(DatabaseSchema.datasource == datasource).all()
         return [
             DatabaseSchemaInfo(
                 table_name=record.table_name,
@@ -175,15 +504,16 @@ async def get_database_schema(db: Session = Depends(get_db)):
         )
 
 @router.post("/schema/refresh")
-async def refresh_database_schema(db: Session = Depends(get_db)):
+async def refresh_database_schema(datasource: Optional[str] = None, db: Session = Depends(get_db)):
     """Refresh database schema information"""
+    datasource = resolve_datasource(datasource)
     try:
         # Clear existing schema
-        db.query(DatabaseSchema).delete()
+        db.query(DatabaseSchema).filter(DatabaseSchema.datasource == datasource).delete()
         
         # Get fresh schema information
-        columns_info = await sql_executor.get_column_info()
-        tables_info = await sql_executor.get_table_info()
+        columns_info = await sql_executor.get_column_info(datasource=datasource)
+        tables_info = await sql_executor.get_table_info(datasource=datasource)
         
         # Create a mapping of table names to comments
         table_comments = {table["table_name"]: table["comment"] for table in tables_info}
@@ -196,12 +526,16 @@ async def refresh_database_schema(db: Session = Depends(get_db)):
                 data_type=column["data_type"],
                 is_nullable=column["is_nullable"],
                 column_comment=column["comment"],
-                table_comment=table_comments.get(column["table_name"])
+                table_comment=table_comments.get(column["table_name"]),
+                datasource=datasource
             )
             db.add(schema_record)
         
         db.commit()
         
+        # Invalidate cached schema snapshots and generated SQL in every worker
+        shared_store.bump_version(f"schema:{datasource}")
+        
         return {"message": f"Schema refreshed successfully. Found {len(columns_info)} columns in {len(tables_info)} tables."}
         
     except Exception as e:
@@ -211,11 +545,63 @@ async def refresh_database_schema(db: Session = Depends(get_db)):
             detail=f"Failed to refresh schema: {str(e)}"
         )
 
+def materialized_answer_info(answer) -> MaterializedAnswerInfo:
+    return MaterializedAnswerInfo(
+        question_key=answer.question_key,
+        question=answer.question,
+        datasource=answer.datasource,
+        generated_sql=answer.generated_sql,
+        row_count=answer.row_count,
+        hit_count=answer.hit_count or 0,
+        append_only=bool(answer.append_only),
+        partition_column=answer.partition_column,
+        watermark=answer.watermark,
+        refreshed_at=answer.refreshed_at,
+        full_refreshed_at=answer.full_refreshed_at,
+        refresh_time=answer.refresh_time,
+        last_error=answer.last_error
+    )
+
+@router.get("/materialized", response_model=List[MaterializedAnswerInfo])
+async def list_materialized_answers(db: Session = Depends(get_db)):
+    """Hot questions with precomputed answers, most asked first"""
+    return [materialized_answer_info(answer) for answer in answer_materializer.list(db)]
+
+@router.patch("/materialized/{question_key}", response_model=MaterializedAnswerInfo)
+async def update_materialized_answer(question_key: str, update: MaterializedAnswerUpdate,
+                                     db: Session = Depends(get_db)):
+    """Opt an answer in to (or out of) incremental refreshes"""
+    answer = answer_materializer.set_append_only(db, question_key, update.append_only)
+    if answer is None:
+        raise HTTPException(status_code=404, detail="Materialized answer not found")
+    return materialized_answer_info(answer)
+
+@router.post("/materialized/refresh")
+async def refresh_materialized_answers():
+    """Mine history and refresh every materialized answer now"""
+    summary = await run_in_threadpool(answer_materializer.refresh, True)
+    if summary["skipped"]:
+        raise HTTPException(status_code=409, detail="A refresh is already running on this host")
+    return summary
+
+@router.get("/traces")
+async def get_recent_traces(limit: int = 20):
+    """Get recently finished traces from the in-process span buffer"""
+    if tracer.memory is None:
+        raise HTTPException(status_code=404, detail="In-memory trace exporter is disabled")
+    return {"traces": tracer.memory.recent_traces(limit)}
+
+@router.get("/datasources", response_model=List[DataSourceInfo])
+async def get_datasources():
+    """List configured analytical datasources and their replica state"""
+    return datasource_manager.list()
+
 @router.get("/tables")
-async def get_tables():
+async def get_tables(datasource: Optional[str] = None):
     """Get list of tables in the database"""
+    datasource = resolve_datasource(datasource)
     try:
-        tables = await sql_executor.get_table_info()
+        tables = await sql_executor.get_table_info(datasource=datasource)
         return {"tables": tables}
     except Exception as e:
         raise HTTPException(
@@ -1,37 +1,78 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import time
 
 from config.settings import settings
-from app.models.database import create_tables
+from app.models.database import create_tables, get_engine, warm_pool
 from app.api.routes import router
+from app.api.middleware import CompressionMiddleware, TimingMiddleware
+from app.api.responses import FastJSONResponse
+from app.services.metrics import metrics
+from app.services.datasource import datasource_manager, replica_lag_monitor
+from app.services.health import health_monitor
+from app.services.ollama_service import ollama_service
+from app.services.answer_materializer import answer_materializer
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup: engines and the Ollama client are built here rather than at import
     print("Starting ChatBI Server...")
+    started = time.perf_counter()
     try:
-        # Create database tables
+        # Create database tables (this also creates the metadata engine)
         create_tables()
         print("Database tables created/verified")
     except Exception as e:
         print(f"Database initialization error: {e}")
     
+    if settings.db_pool_warmup:
+        try:
+            # Open pooled connections now instead of on the first requests
+            opened = warm_pool(get_engine())
+            print(f"Metadata pool warmed: {opened} connections")
+            print(f"Datasource pools warmed: {datasource_manager.warm_up()}")
+        except Exception as e:
+            print(f"Pool warm-up error: {e}")
+    
+    ollama_service.start()
+    health_monitor.start()
+    replica_lag_monitor.start()
+    if settings.materialize_answers:
+        answer_materializer.start()
+    print(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f}ms")
+    
     yield
     
     # Shutdown
     print("Shutting down ChatBI Server...")
+    await health_monitor.stop()
+    await replica_lag_monitor.stop()
+    await answer_materializer.stop()
+    await ollama_service.stop()
 
 # Create FastAPI app
 app = FastAPI(
     title="ChatBI Server",
-    description="Natural Language to SQL API using LangChain and Ollama",
+    description="Natural Language to SQL API using Ollama",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Negotiated zstd/gzip compression, innermost so Server-Timing includes it
+if settings.response_compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.gzip_level,
+        zstd_level=settings.zstd_level
+    )
+
+# Request span and Server-Timing header
+app.add_middleware(TimingMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +80,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "Server-Timing", "traceparent", "Retry-After", "ETag",
+        "RateLimit-Policy", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset"
+    ],
 )
 
 # Include API routes
@@ -52,6 +97,11 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.content_type)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     return JSONResponse(
@@ -60,6 +110,7 @@ async def global_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "app.main:app",
         host=settings.api_host,
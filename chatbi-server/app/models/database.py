@@ -1,8 +1,19 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON
+from sqlalchemy import create_engine, event, exc, inspect, text, Boolean, Column, Integer, Float, String, Text, DateTime, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
+from typing import Optional
+import time
 from config.settings import settings
+from app.services.serialization import dumps_str
+from app.services.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_EXHAUSTED,
+    DB_POOL_STALE,
+    DB_POOL_TIMEOUTS,
+    register_engine_pool,
+)
 
 Base = declarative_base()
 
@@ -15,7 +26,10 @@ class QueryHistory(Base):
     execution_result = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     execution_time = Column(Integer, nullable=True)  # in milliseconds
-    status = Column(String(50), default="success")  # success, error, pending
+    status = Column(String(50), default="success")  # executed, generated, materialized, error
+    datasource = Column(String(100), nullable=False, default="default", server_default="default")
+    result_etag = Column(String(64), nullable=True)  # content hash of execution_result
+    sample_rate = Column(Float, nullable=True)  # set when execution_result was computed on a sample
 
 class DatabaseSchema(Base):
     __tablename__ = "database_schema"
@@ -27,23 +41,172 @@ class DatabaseSchema(Base):
     is_nullable = Column(String(10), nullable=False)
     column_comment = Column(Text, nullable=True)
     table_comment = Column(Text, nullable=True)
+    datasource = Column(String(100), nullable=False, default="default", server_default="default")
 
-# Database connection
-engine = create_engine(
-    settings.database_url,
-    echo=settings.debug,
-    pool_pre_ping=True,
-    pool_recycle=300
-)
+class MaterializedAnswer(Base):
+    __tablename__ = "materialized_answers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    question_key = Column(String(40), nullable=False, unique=True, index=True)  # hash of datasource + normalized question
+    datasource = Column(String(100), nullable=False, default="default")
+    question = Column(Text, nullable=False)
+    generated_sql = Column(Text, nullable=False)
+    execution_result = Column(JSON, nullable=True)
+    row_count = Column(Integer, nullable=True)
+    hit_count = Column(Integer, default=0)  # executions in the mining window
+    append_only = Column(Boolean, nullable=False, default=False, server_default="0")  # opt-in: past partitions never change
+    partition_column = Column(String(255), nullable=True)  # set when refreshes can be incremental
+    watermark = Column(String(64), nullable=True)  # latest partition value already materialized
+    refreshed_at = Column(DateTime, nullable=True)
+    full_refreshed_at = Column(DateTime, nullable=True)
+    refresh_time = Column(Integer, nullable=True)  # in milliseconds
+    last_error = Column(Text, nullable=True)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout latency, exhaustion and timeouts, labelled by its logging name"""
+
+    def __init__(self, *args, max_overflow: int = 10, logging_name: Optional[str] = None, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, logging_name=logging_name, **kwargs)
+        # Kept here so exhaustion is judged from the public checkedin()/checkedout()/size() API
+        self.metrics_name = logging_name or "unknown"
+        self.overflow_limit = max_overflow
+
+    def is_exhausted(self) -> bool:
+        """Every pooled and overflow connection is checked out, so the next checkout waits"""
+        if self.overflow_limit < 0:
+            return False
+        return self.checkedin() == 0 and self.checkedout() >= self.size() + self.overflow_limit
+
+    def _do_get(self):
+        name = self.metrics_name
+        if self.is_exhausted():
+            DB_POOL_EXHAUSTED.inc(engine=name)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(engine=name)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start, engine=name)
+
+def _install_idle_ping(engine, name: str):
+    """Ping a connection on checkout only if it sat idle in the pool for a while
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Replaces pool_pre_ping, which pays a round-trip on every checkout. Busy
+    connections are reused as-is; a dead one raises DisconnectionError so the
+    pool discards it and hands out a fresh connection.
+    """
+    ping_after = settings.db_pool_ping_after_idle
+    if ping_after < 0:
+        return
+
+    @event.listens_for(engine, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        idle_since = connection_record.info.pop("idle_since", None)
+        if idle_since is None or time.monotonic() - idle_since < ping_after:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            DB_POOL_STALE.inc(engine=name)
+            raise exc.DisconnectionError()
+
+def create_db_engine(database_url: str, name: str, pool_size: int = 5, max_overflow: int = 10,
+                     pool_timeout: float = 10.0):
+    """Create an engine with the application's connection settings and pool metrics"""
+    connect_args = {}
+    pool_args = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        # LIFO keeps reusing the warmest connections and lets surplus ones go idle
+        "pool_use_lifo": True,
+        "pool_logging_name": name,
+    }
+    if database_url.startswith("sqlite"):
+        # Sessions are opened in FastAPI's threadpool and used on the event loop
+        connect_args["check_same_thread"] = False
+        if ":memory:" in database_url or database_url.rstrip("/") == "sqlite:":
+            pool_args = {}
+    
+    engine = create_engine(
+        database_url,
+        echo=settings.debug,
+        pool_recycle=settings.db_pool_recycle,
+        # JSON columns hold raw result rows (Decimal, datetime)
+        json_serializer=dumps_str,
+        connect_args=connect_args,
+        **pool_args
+    )
+    _install_idle_ping(engine, name)
+    register_engine_pool(name, engine)
+    return engine
+
+def warm_pool(engine) -> int:
+    """Open pool_size connections up front so early requests skip connection setup"""
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connections.append(engine.raw_connection())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+# Metadata/history store, separate from the analytical datasources. Bound by
+# get_engine(), which the app lifespan calls first, so importing this module
+# does not load the DB driver or build a pool.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+_engine = None
+
+def get_engine():
+    """The metadata engine, created on first use"""
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine(
+            settings.metadata_database_url,
+            "metadata",
+            pool_size=settings.metadata_pool_size,
+            max_overflow=settings.metadata_max_overflow,
+            pool_timeout=settings.metadata_pool_timeout
+        )
+        SessionLocal.configure(bind=_engine)
+    return _engine
 
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def _add_missing_columns():
+    """Add columns introduced after a table was first created (create_all skips existing tables)"""
+    engine = get_engine()
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT '{column.server_default.arg}'"
+                connection.execute(text(ddl))
+
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine())
+    _add_missing_columns()
\ No newline at end of file
@@ -1,10 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 class QueryRequest(BaseModel):
     query: str
     execute: bool = False
+    datasource: Optional[str] = None  # named analytical datasource, defaults to "default"
+    max_staleness: Optional[float] = None  # seconds; tightens the materialized answer bound, 0 bypasses it
+    sample_rate: Optional[float] = Field(None, gt=0, lt=1)  # run on a Bernoulli sample of the first table
+
+class RefreshRequest(BaseModel):
+    etag: Optional[str] = None  # result_etag of the result the client holds
+    delta: bool = True  # allow a row delta against that result instead of the full result
 
 class QueryResponse(BaseModel):
     id: Optional[int] = None
@@ -14,6 +21,20 @@ class QueryResponse(BaseModel):
     execution_time: Optional[int] = None
     status: str = "success"
     created_at: Optional[datetime] = None
+    datasource: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # per-stage breakdown in milliseconds
+    materialized_at: Optional[datetime] = None  # set when served from a materialized answer
+    total_rows: Optional[int] = None  # size of the full result, see total_rows_kind
+    total_rows_kind: Optional[str] = None  # exact, lower_bound or estimate
+    next_cursor: Optional[str] = None  # fetch further rows from /query/{id}/rows
+    sample_rate: Optional[float] = None  # set when the result comes from a sample
+    result_etag: Optional[str] = None  # content hash of execution_result
+    delta: Optional[Dict[str, Any]] = None  # refresh only: row changes since base_etag, instead of execution_result
+
+class ResultPage(BaseModel):
+    rows: List[Dict[str, Any]]
+    offset: int
+    next_cursor: Optional[str] = None
 
 class DatabaseSchemaInfo(BaseModel):
     table_name: str
@@ -23,11 +44,47 @@ class DatabaseSchemaInfo(BaseModel):
     column_comment: Optional[str] = None
     table_comment: Optional[str] = None
 
+class ReplicaInfo(BaseModel):
+    name: str
+    lag_seconds: Optional[float] = None
+    available: bool
+
+class DataSourceInfo(BaseModel):
+    name: str
+    max_replica_lag: float
+    replicas: List[ReplicaInfo] = []
+
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str] = None
 
+class DependencyHealth(BaseModel):
+    status: str  # healthy, unhealthy, unknown (not probed yet)
+    latency_ms: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    last_success: Optional[datetime] = None
+    error: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     timestamp: datetime
-    version: str = "1.0.0"
\ No newline at end of file
+    version: str = "1.0.0"
+    checks: Dict[str, DependencyHealth] = {}
+
+class MaterializedAnswerInfo(BaseModel):
+    question_key: str
+    question: str
+    datasource: str
+    generated_sql: str
+    row_count: Optional[int] = None
+    hit_count: int = 0
+    append_only: bool = False
+    partition_column: Optional[str] = None
+    watermark: Optional[str] = None
+    refreshed_at: Optional[datetime] = None
+    full_refreshed_at: Optional[datetime] = None
+    refresh_time: Optional[int] = None
+    last_error: Optional[str] = None
+
+class MaterializedAnswerUpdate(BaseModel):
+    append_only: bool  # past partitions never change, so refreshes may be incremental
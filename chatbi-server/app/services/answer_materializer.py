@@ -0,0 +1,296 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+import asyncio
+import re
+import time
+from config.settings import settings
+from app.models.database import SessionLocal, QueryHistory, MaterializedAnswer
+from app.services.sql_generator import sql_generator
+from app.services.sql_executor import sql_executor
+from app.services.datasource import datasource_manager
+from app.services.metrics import metrics, CACHE_HITS, CACHE_MISSES
+from app.services.serialization import to_jsonable
+from app.services.sql_rewrite import split_top_level
+from app.services.shared_state import HostSemaphore, cache_key, normalize_question
+
+# Same cap as the /query preview, so a materialized answer matches a live one
+RESULT_LIMIT = 1000
+
+# Partition values that are safe to compare against and inline as a watermark
+_PARTITION_VALUE = re.compile(r"^\d{4}(-\d{2}(-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?)?)?$")
+
+MATERIALIZE_REFRESHES = metrics.counter(
+    "chatbi_materialize_refreshes_total",
+    "Materialized answer refreshes by kind (full, incremental) and outcome",
+    ("kind", "outcome"),
+)
+
+
+def _same_expression(a: str, b: str) -> bool:
+    return " ".join(a.lower().replace("`", "").split()) == " ".join(b.lower().replace("`", "").split())
+
+
+def partition_spec(sql: str) -> Optional[Tuple[str, bool]]:
+    """(alias, descending) when the SQL groups by its first, aliased output column
+
+    Such a result is one row per partition (e.g. per day), so a refresh can
+    recompute only partitions at or after the last one seen and keep the rest.
+    Anything with a LIMIT, or ordered by something else, is refreshed in full.
+    """
+    sql = " ".join(sql.strip().rstrip(";").split())
+    if re.search(r"\blimit\b", sql, re.IGNORECASE):
+        return None
+    select = re.match(r"select\s+(?:distinct\s+)?(.+?)\s+from\s", sql, re.IGNORECASE)
+    group_by = re.search(r"\bgroup\s+by\s+(.+?)(?:\s+having\s|\s+order\s+by\s|$)", sql, re.IGNORECASE)
+    if not select or not group_by:
+        return None
+    first = re.match(r"^(.+?)\s+as\s+`?(\w+)`?$", split_top_level(select.group(1))[0], re.IGNORECASE)
+    if not first:
+        return None
+    expression, alias = first.groups()
+    key = split_top_level(group_by.group(1))[0]
+    if not (_same_expression(key, expression) or _same_expression(key, alias)):
+        return None
+
+    descending = False
+    order_by = re.search(r"\border\s+by\s+(.+)$", sql, re.IGNORECASE)
+    if order_by:
+        items = split_top_level(order_by.group(1))
+        item = re.match(r"^(.+?)(?:\s+(asc|desc))?$", items[0], re.IGNORECASE)
+        if len(items) != 1 or not (_same_expression(item.group(1), expression) or _same_expression(item.group(1), alias)):
+            return None
+        descending = (item.group(2) or "").lower() == "desc"
+    return alias, descending
+
+
+def _partition_watermark(rows: List[Dict[str, Any]], column: str) -> Optional[str]:
+    values = [row.get(column) for row in rows if row.get(column) is not None]
+    if not values or not all(isinstance(v, (int, str)) and _PARTITION_VALUE.match(str(v)) for v in values):
+        return None
+    return str(max(values))
+
+
+def _literal(watermark: str) -> str:
+    # Only values matching _PARTITION_VALUE are ever stored, so inlining is safe
+    return watermark if watermark.isdigit() else f"'{watermark}'"
+
+
+def _sort_key(column: str):
+    return lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else "")
+
+
+def fresh_as_of(answer: MaterializedAnswer) -> Optional[datetime]:
+    """When every row of the answer was last recomputed
+
+    An incremental refresh keeps partitions below the watermark from earlier
+    runs, so unless the answer is append-only they are only as fresh as the
+    last full refresh.
+    """
+    return answer.refreshed_at if answer.append_only else answer.full_refreshed_at
+
+
+class AnswerMaterializer:
+    """Precomputes results for the most frequently executed questions and serves them within a staleness bound"""
+
+    def __init__(self):
+        self._lock = HostSemaphore("materialize", 1, settings.shared_lock_dir)
+        self._task: Optional[asyncio.Task] = None
+
+    def lookup(self, db: Session, datasource: str, question: str,
+               max_staleness: Optional[float] = None) -> Optional[MaterializedAnswer]:
+        """A materialized answer no older than the staleness bound, or None"""
+        staleness = settings.materialize_max_staleness
+        if max_staleness is not None:
+            staleness = min(staleness, max_staleness)
+        if staleness <= 0:
+            return None
+        key = cache_key(datasource, normalize_question(question))
+        answer = db.query(MaterializedAnswer).filter(MaterializedAnswer.question_key == key).first()
+        as_of = fresh_as_of(answer) if answer is not None else None
+        if as_of is None or (datetime.utcnow() - as_of).total_seconds() > staleness:
+            CACHE_MISSES.inc(cache="materialized")
+            return None
+        CACHE_HITS.inc(cache="materialized")
+        return answer
+
+    def mine(self, db: Session) -> List[Dict[str, Any]]:
+        """Most asked normalized questions in the lookback window, with their latest executed SQL
+
+        Requests served from a materialized answer count as demand, so a hot
+        answer keeps its place, but only real executions supply the SQL. An
+        entry without "generated_sql" keeps its stored answer's SQL.
+        """
+        since = datetime.utcnow() - timedelta(days=settings.materialize_lookback_days)
+        history = db.query(
+            QueryHistory.natural_language_query, QueryHistory.generated_sql, QueryHistory.datasource,
+            QueryHistory.status
+        ).filter(
+            QueryHistory.status.in_(("executed", "materialized")), QueryHistory.created_at >= since
+        ).order_by(QueryHistory.created_at).yield_per(5000)
+
+        questions: Dict[str, Dict[str, Any]] = {}
+        for question, sql, datasource, status in history:
+            key = cache_key(datasource, normalize_question(question))
+            entry = questions.setdefault(key, {"question_key": key, "datasource": datasource, "hit_count": 0})
+            entry["hit_count"] += 1
+            if status == "executed":
+                # Rows arrive oldest first, so the latest question/SQL wins
+                entry["question"] = question
+                entry["generated_sql"] = sql
+
+        hot = [
+            entry for entry in questions.values()
+            if entry["hit_count"] >= settings.materialize_min_hits
+            and entry["datasource"] in datasource_manager.datasources
+            and (
+                "generated_sql" not in entry
+                or entry["generated_sql"].lower().strip().startswith("select")
+                and sql_generator.validate_sql(entry["generated_sql"])
+            )
+        ]
+        hot.sort(key=lambda entry: entry["hit_count"], reverse=True)
+        return hot[:settings.materialize_top_n]
+
+    def _sync(self, db: Session, hot: List[Dict[str, Any]]) -> None:
+        """Make the stored answers match the current hot set"""
+        existing = {answer.question_key: answer for answer in db.query(MaterializedAnswer).all()}
+        for entry in hot:
+            answer = existing.pop(entry["question_key"], None)
+            if answer is None:
+                if "generated_sql" in entry:
+                    db.add(MaterializedAnswer(**entry))
+                continue
+            answer.hit_count = entry["hit_count"]
+            if "generated_sql" not in entry:
+                continue
+            answer.question = entry["question"]
+            if answer.generated_sql != entry["generated_sql"]:
+                # New SQL for the question: start over with a full refresh, and
+                # the append-only opt-in was made for the old SQL
+                answer.generated_sql = entry["generated_sql"]
+                answer.refreshed_at = answer.full_refreshed_at = None
+                answer.partition_column = answer.watermark = None
+                answer.append_only = False
+        for answer in existing.values():
+            db.delete(answer)
+        db.commit()
+
+    def _refresh(self, answer: MaterializedAnswer, now: datetime) -> None:
+        start = time.perf_counter()
+        spec = partition_spec(answer.generated_sql)
+        incremental = (
+            answer.append_only
+            and spec is not None
+            and answer.partition_column == spec[0]
+            and answer.watermark is not None
+            and answer.full_refreshed_at is not None
+            and (now - answer.full_refreshed_at).total_seconds() < settings.materialize_full_refresh_interval
+        )
+        kind = "incremental" if incremental else "full"
+
+        if incremental:
+            column, descending = spec
+            base_sql = answer.generated_sql.strip().rstrip(";")
+            sql = (
+                f"SELECT * FROM ({base_sql}) AS materialized_base "
+                f"WHERE materialized_base.{column} >= {_literal(answer.watermark)}"
+            )
+        else:
+            sql = answer.generated_sql
+        result = sql_executor.run_query(sql, RESULT_LIMIT, answer.datasource)
+        if not result["success"]:
+            # Keep the previous result; lookup stops serving it once it is too old
+            answer.last_error = result["error"]
+            MATERIALIZE_REFRESHES.inc(kind=kind, outcome="error")
+            return
+
+        rows = to_jsonable(result["data"])
+        if incremental:
+            kept = [
+                row for row in answer.execution_result or []
+                if row.get(column) is None or str(row.get(column)) < answer.watermark
+            ]
+            rows = sorted(kept + rows, key=_sort_key(column), reverse=descending)
+        else:
+            answer.full_refreshed_at = now
+
+        # A truncated result cannot be extended partition by partition
+        watermark = _partition_watermark(rows, spec[0]) if spec and len(rows) < RESULT_LIMIT else None
+        answer.partition_column = spec[0] if watermark is not None else None
+        answer.watermark = watermark
+        answer.execution_result = rows
+        answer.row_count = len(rows)
+        answer.refreshed_at = now
+        answer.refresh_time = int((time.perf_counter() - start) * 1000)
+        answer.last_error = None
+        MATERIALIZE_REFRESHES.inc(kind=kind, outcome="success")
+
+    def refresh(self, force: bool = False) -> Dict[str, Any]:
+        """One cycle: mine hot questions, then refresh answers that are due
+
+        Only one process on the host runs a cycle at a time; others skip it.
+        """
+        fd = self._lock.try_acquire()
+        if fd is None:
+            return {"skipped": True}
+        db = SessionLocal()
+        try:
+            self._sync(db, self.mine(db))
+            now = datetime.utcnow()
+            refreshed, failed = 0, 0
+            for answer in db.query(MaterializedAnswer).all():
+                due = (
+                    force
+                    or answer.refreshed_at is None
+                    or (now - answer.refreshed_at).total_seconds() >= settings.materialize_interval
+                )
+                if not due:
+                    continue
+                self._refresh(answer, now)
+                # Commit per answer so lookups see each one as soon as it is ready
+                db.commit()
+                if answer.last_error:
+                    failed += 1
+                else:
+                    refreshed += 1
+            return {"skipped": False, "refreshed": refreshed, "failed": failed}
+        finally:
+            db.close()
+            self._lock.release(fd)
+
+    def list(self, db: Session) -> List[MaterializedAnswer]:
+        return db.query(MaterializedAnswer).order_by(MaterializedAnswer.hit_count.desc()).all()
+
+    def set_append_only(self, db: Session, question_key: str, append_only: bool) -> Optional[MaterializedAnswer]:
+        """Allow (or stop) incremental refreshes for an answer whose past partitions never change"""
+        answer = db.query(MaterializedAnswer).filter(MaterializedAnswer.question_key == question_key).first()
+        if answer is None:
+            return None
+        answer.append_only = append_only
+        db.commit()
+        return answer
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Answer materialization error: {e}")
+            await asyncio.sleep(settings.materialize_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+answer_materializer = AnswerMaterializer()
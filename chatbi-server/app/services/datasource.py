@@ -0,0 +1,217 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+import asyncio
+import json
+import random
+import threading
+import time
+from config.settings import settings
+from app.models.database import create_db_engine, warm_pool
+
+DEFAULT_DATASOURCE = "default"
+
+
+def measure_replica_lag(engine: Engine) -> Optional[float]:
+    """Seconds the replica is behind its source; 0 for a standalone server, None if unusable"""
+    if engine.dialect.name != "mysql":
+        return 0.0
+    try:
+        with engine.connect() as connection:
+            for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+                try:
+                    row = connection.execute(text(statement)).mappings().first()
+                    break
+                except Exception:
+                    # SHOW REPLICA STATUS needs MySQL 8.0.22+
+                    connection.rollback()
+            else:
+                return None
+    except Exception:
+        return None
+    if row is None:
+        return 0.0
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    # NULL means the replication threads are stopped
+    return float(lag) if lag is not None else None
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        # Written by the lag monitor thread and by request threads on failure
+        self._lock = threading.Lock()
+
+    def record_lag(self, lag: Optional[float], now: float) -> None:
+        with self._lock:
+            self.lag = lag
+            self.checked_at = now
+            if lag is None:
+                self.down_until = max(self.down_until, now + settings.replica_retry_after)
+
+    def mark_down(self, now: float) -> None:
+        with self._lock:
+            self.down_until = now + settings.replica_retry_after
+
+    def usable_lag(self, now: float) -> Optional[float]:
+        """Cached lag plus the reading's age (lag can grow at most that fast); None if down or unmeasured"""
+        with self._lock:
+            if self.down_until > now or self.lag is None:
+                return None
+            return self.lag + max(0.0, now - self.checked_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "lag_seconds": self.lag,
+                "available": self.down_until <= time.time(),
+            }
+
+
+class DataSource:
+    """An analytical database: a primary plus optional read replicas, each with its own pool"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.max_replica_lag = float(config.get("max_replica_lag", settings.max_replica_lag))
+        self.primary = create_db_engine(
+            config["url"],
+            f"{name}.primary",
+            pool_size=config.get("pool_size", settings.analytics_pool_size),
+            max_overflow=config.get("max_overflow", settings.analytics_max_overflow),
+            pool_timeout=config.get("pool_timeout", settings.analytics_pool_timeout),
+        )
+
+        self.replicas: List[Replica] = []
+        for index, url in enumerate(config.get("replicas", []), start=1):
+            engine = create_db_engine(
+                url,
+                f"{name}.replica{index}",
+                pool_size=config.get("replica_pool_size", settings.replica_pool_size),
+                max_overflow=config.get("replica_max_overflow", settings.replica_max_overflow),
+                pool_timeout=config.get("replica_pool_timeout", settings.replica_pool_timeout),
+            )
+            self.replicas.append(Replica(f"replica{index}", engine))
+
+    def read_targets(self) -> List[Tuple[str, Engine]]:
+        """Engines for read-only SQL: replicas within the lag budget (freshest first), then the primary
+
+        Only cached lag readings are used; the lag monitor refreshes them off the request path.
+        """
+        now = time.time()
+        candidates = []
+        for replica in self.replicas:
+            lag = replica.usable_lag(now)
+            if lag is not None and lag <= self.max_replica_lag:
+                # Random tie-breaker spreads load across equally fresh replicas
+                candidates.append((lag, random.random(), replica))
+        candidates.sort(key=lambda item: item[:2])
+        return [(replica.name, replica.engine) for _, _, replica in candidates] + [("primary", self.primary)]
+
+    def mark_down(self, target: str) -> None:
+        """Take a failed replica out of rotation for a while"""
+        for replica in self.replicas:
+            if replica.name == target:
+                replica.mark_down(time.time())
+
+    def refresh_replica_lag(self) -> None:
+        """Measure every replica's lag; blocking, so call it from a worker thread"""
+        for replica in self.replicas:
+            replica.record_lag(measure_replica_lag(replica.engine), time.time())
+
+    def warm_up(self) -> Dict[str, int]:
+        """Fill every pool and take a first replica lag reading; unreachable engines are skipped"""
+        opened = {}
+        for target, engine in [("primary", self.primary)] + [(r.name, r.engine) for r in self.replicas]:
+            try:
+                opened[target] = warm_pool(engine)
+            except Exception as e:
+                print(f"Pool warm-up failed for {self.name}.{target}: {e}")
+                self.mark_down(target)
+        self.refresh_replica_lag()
+        return opened
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_replica_lag": self.max_replica_lag,
+            "replicas": [replica.to_dict() for replica in self.replicas],
+        }
+
+
+class DataSourceManager:
+    def __init__(self):
+        configs: Dict[str, Dict[str, Any]] = {
+            DEFAULT_DATASOURCE: {
+                "url": settings.database_url,
+                "replicas": [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()],
+            }
+        }
+        if settings.datasources:
+            configs.update(json.loads(settings.datasources))
+        self.configs = configs
+        self._datasources: Optional[Dict[str, DataSource]] = None
+
+    @property
+    def datasources(self) -> Dict[str, DataSource]:
+        """Datasources by name; engines are created on first access, not at import"""
+        if self._datasources is None:
+            self._datasources = {name: DataSource(name, config) for name, config in self.configs.items()}
+        return self._datasources
+
+    def resolve(self, name: Optional[str] = None) -> str:
+        name = name or DEFAULT_DATASOURCE
+        if name not in self.configs:
+            raise KeyError(f"Unknown datasource: {name}")
+        return name
+
+    def get(self, name: Optional[str] = None) -> DataSource:
+        return self.datasources[self.resolve(name)]
+
+    def warm_up(self) -> Dict[str, Dict[str, int]]:
+        return {name: datasource.warm_up() for name, datasource in self.datasources.items()}
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [datasource.to_dict() for datasource in self.datasources.values()]
+
+
+class ReplicaLagMonitor:
+    """Samples replica lag in the background so routing reads it from memory"""
+
+    def __init__(self, manager: DataSourceManager):
+        self.manager = manager
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        datasources = [ds for ds in self.manager.datasources.values() if ds.replicas]
+        await asyncio.gather(*(asyncio.to_thread(ds.refresh_replica_lag) for ds in datasources))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Replica lag check error: {e}")
+            await asyncio.sleep(settings.replica_lag_check_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+datasource_manager = DataSourceManager()
+replica_lag_monitor = ReplicaLagMonitor(datasource_manager)
@@ -0,0 +1,136 @@
+from typing import Dict, List, Tuple
+from collections import Counter, OrderedDict
+from sqlalchemy.orm import Session
+import math
+import re
+import threading
+import time
+from config.settings import settings
+from app.models.database import QueryHistory
+from app.services.shared_state import normalize_question
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "to", "by", "and", "or", "is", "are", "what", "which",
+    "show", "me", "list", "give", "get", "find", "all", "with", "from", "each", "per", "do", "does",
+}
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about 4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+class FewShotIndex:
+    """BM25 index over successful question -> SQL pairs from query history
+
+    Built from the newest FEW_SHOT_INDEX_SIZE entries on first use, then
+    extended with rows past the last indexed id at most every
+    FEW_SHOT_REFRESH_INTERVAL seconds. One entry per datasource and normalized
+    question; a newer success replaces the older one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: "OrderedDict[Tuple[str, str], Tuple[str, str, Counter, int]]" = OrderedDict()
+        self._postings: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._total_length = 0
+        self._last_id = 0
+        self._refreshed_at = 0.0
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        _, _, terms, length = self._docs.pop(key)
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+    def add(self, datasource: str, question: str, sql: str) -> None:
+        normalized = normalize_question(question)
+        terms = Counter(tokenize(normalized))
+        if not terms:
+            return
+        key = (datasource, normalized)
+        with self._lock:
+            if key in self._docs:
+                self._remove(key)
+            length = sum(terms.values())
+            self._docs[key] = (question, sql, terms, length)
+            self._total_length += length
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[key] = count
+            while len(self._docs) > settings.few_shot_index_size:
+                self._remove(next(iter(self._docs)))
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """Index history rows added since the last refresh; returns how many were read"""
+        if not force and time.monotonic() - self._refreshed_at < settings.few_shot_refresh_interval:
+            return 0
+        self._refreshed_at = time.monotonic()
+        query = db.query(
+            QueryHistory.id, QueryHistory.datasource, QueryHistory.natural_language_query, QueryHistory.generated_sql
+        ).filter(QueryHistory.status == "executed")
+        if self._last_id:
+            rows = query.filter(QueryHistory.id > self._last_id).order_by(QueryHistory.id).all()
+        else:
+            rows = query.order_by(QueryHistory.id.desc()).limit(settings.few_shot_index_size).all()[::-1]
+        for row_id, datasource, question, sql in rows:
+            self.add(datasource, question, sql)
+            self._last_id = max(self._last_id, row_id)
+        return len(rows)
+
+    def search(self, datasource: str, question: str, k: int) -> List[Tuple[float, str, str]]:
+        """Top k (score, question, sql) for the datasource, best first"""
+        terms = set(tokenize(normalize_question(question)))
+        with self._lock:
+            if not self._docs or not terms:
+                return []
+            doc_count = len(self._docs)
+            average_length = self._total_length / doc_count
+            scores: Dict[Tuple[str, str], float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings.items():
+                    if key[0] != datasource:
+                        continue
+                    length = self._docs[key][3]
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (_K1 + 1) / (
+                        tf + _K1 * (1 - _B + _B * length / average_length)
+                    )
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(score, self._docs[key][0], self._docs[key][1]) for key, score in best]
+
+    def select_examples(self, db: Session, datasource: str, question: str) -> List[Tuple[str, str]]:
+        """Most similar successful pairs that fit the token budget"""
+        if settings.few_shot_k <= 0:
+            return []
+        self.refresh(db)
+        examples, budget = [], settings.few_shot_max_tokens
+        for score, example_question, sql in self.search(datasource, question, settings.few_shot_k):
+            if score < settings.few_shot_min_score:
+                break
+            cost = estimate_tokens(example_question) + estimate_tokens(sql)
+            if cost > budget:
+                break
+            examples.append((example_question, sql))
+            budget -= cost
+        return examples
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+few_shot_index = FewShotIndex()
@@ -0,0 +1,133 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from datetime import datetime
+from sqlalchemy import text
+import asyncio
+import time
+from config.settings import settings
+from app.models.database import get_engine
+from app.services.datasource import datasource_manager
+from app.services.metrics import metrics
+from app.services.ollama_service import ollama_service
+
+DEPENDENCY_UP = metrics.gauge(
+    "chatbi_dependency_up",
+    "1 if the last background health probe of a dependency succeeded",
+    ("dependency",),
+)
+PROBE_SECONDS = metrics.histogram(
+    "chatbi_health_probe_seconds",
+    "Latency of background health probes per dependency",
+    ("dependency",),
+)
+
+
+class ProbeState:
+    def __init__(self, name: str):
+        self.name = name
+        self.healthy: Optional[bool] = None
+        self.latency_ms: Optional[float] = None
+        self.last_checked: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._checked_at = 0.0
+
+    def is_healthy(self) -> bool:
+        # A result older than a few intervals means the probe loop itself is stuck
+        fresh = time.monotonic() - self._checked_at <= settings.health_check_interval * 3 + settings.health_probe_timeout
+        return bool(self.healthy) and fresh
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.healthy is None:
+            status = "unknown"
+        else:
+            status = "healthy" if self.is_healthy() else "unhealthy"
+        return {
+            "status": status,
+            "latency_ms": self.latency_ms,
+            "last_checked": self.last_checked,
+            "last_success": self.last_success,
+            "error": self.error,
+        }
+
+
+def _ping_engine(engine) -> None:
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def _probe_ollama() -> None:
+    if not await ollama_service.check_health():
+        raise Exception("Ollama did not answer /api/tags")
+
+
+def _engine_probe(get: Callable[[], Any]) -> Callable[[], Awaitable[None]]:
+    async def probe() -> None:
+        # Blocking DB driver: keep it off the event loop
+        await asyncio.to_thread(_ping_engine, get())
+    return probe
+
+
+class HealthMonitor:
+    """Probes dependencies in the background so health endpoints answer from memory"""
+
+    def __init__(self):
+        self.probes: Dict[str, Callable[[], Awaitable[None]]] = {
+            "ollama": _probe_ollama,
+            "metadata_db": _engine_probe(get_engine),
+        }
+        for name in datasource_manager.configs:
+            self.probes[f"datasource:{name}"] = _engine_probe(lambda name=name: datasource_manager.get(name).primary)
+        self.states = {name: ProbeState(name) for name in self.probes}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_probe(self, name: str) -> None:
+        state = self.states[name]
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.probes[name](), timeout=settings.health_probe_timeout)
+            state.healthy, state.error = True, None
+            state.last_success = datetime.utcnow()
+        except asyncio.TimeoutError:
+            state.healthy, state.error = False, f"Probe timed out after {settings.health_probe_timeout}s"
+        except Exception as e:
+            state.healthy, state.error = False, str(e) or type(e).__name__
+        elapsed = time.perf_counter() - start
+        state.latency_ms = round(elapsed * 1000, 2)
+        state.last_checked = datetime.utcnow()
+        state._checked_at = time.monotonic()
+        PROBE_SECONDS.observe(elapsed, dependency=name)
+        DEPENDENCY_UP.set(1 if state.healthy else 0, dependency=name)
+
+    async def run_once(self) -> None:
+        await asyncio.gather(*(self._run_probe(name) for name in self.probes))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Health probe error: {e}")
+            await asyncio.sleep(settings.health_check_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_ready(self) -> bool:
+        """Every dependency answered its most recent probe"""
+        return all(state.is_healthy() for state in self.states.values())
+
+    def checks(self) -> Dict[str, Dict[str, Any]]:
+        return {name: state.to_dict() for name, state in self.states.items()}
+
+
+health_monitor = HealthMonitor()
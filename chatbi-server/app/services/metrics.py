@@ -0,0 +1,342 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from contextlib import contextmanager
+from bisect import bisect_left
+import threading
+import time
+from app.services.tracing import record_timing
+
+# Latency buckets (seconds) sized for a request that spans sub-millisecond
+# validation up to multi-second LLM generations
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge whose value is either set explicitly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float], **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._callbacks[key] = func
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = list(self._callbacks.items())
+        for key, func in callbacks:
+            try:
+                values[key] = float(func())
+            except Exception:
+                continue
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal in-process registry rendering the Prometheus text exposition format"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Per-stage latency of the /query pipeline
+QUERY_STAGE_SECONDS = metrics.histogram(
+    "chatbi_query_stage_seconds",
+    "Latency of each /query pipeline stage in seconds",
+    ("stage",),
+)
+QUERY_TOTAL_SECONDS = metrics.histogram(
+    "chatbi_query_seconds",
+    "End-to-end /query latency in seconds",
+    ("status",),
+)
+
+# Ollama-reported generation statistics
+OLLAMA_EVAL_TOKENS = metrics.histogram(
+    "chatbi_ollama_eval_tokens",
+    "Tokens generated per Ollama call (eval_count)",
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+OLLAMA_PROMPT_TOKENS = metrics.histogram(
+    "chatbi_ollama_prompt_tokens",
+    "Prompt tokens evaluated per Ollama call (prompt_eval_count)",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+OLLAMA_EVAL_SECONDS = metrics.histogram(
+    "chatbi_ollama_eval_duration_seconds",
+    "Time Ollama spent generating tokens (eval_duration)",
+)
+OLLAMA_PROMPT_EVAL_SECONDS = metrics.histogram(
+    "chatbi_ollama_prompt_eval_duration_seconds",
+    "Time Ollama spent evaluating the prompt (prompt_eval_duration)",
+)
+
+CACHE_HITS = metrics.counter(
+    "chatbi_cache_hits_total",
+    "Cache hits by cache name",
+    ("cache",),
+)
+CACHE_MISSES = metrics.counter(
+    "chatbi_cache_misses_total",
+    "Cache misses by cache name",
+    ("cache",),
+)
+ERRORS = metrics.counter(
+    "chatbi_errors_total",
+    "Errors by pipeline stage and error type",
+    ("stage", "type"),
+)
+
+SQL_GENERATION_OUTCOMES = metrics.counter(
+    "chatbi_sql_generation_outcomes_total",
+    "First-attempt outcome of LLM-generated SQL, by whether the prompt had few-shot examples",
+    ("outcome", "few_shot"),
+)
+
+DB_POOL_SIZE = metrics.gauge(
+    "chatbi_db_pool_size",
+    "Configured connection pool size per engine",
+    ("engine",),
+)
+DB_POOL_CHECKED_OUT = metrics.gauge(
+    "chatbi_db_pool_checked_out",
+    "Connections currently checked out per engine",
+    ("engine",),
+)
+DB_POOL_OVERFLOW = metrics.gauge(
+    "chatbi_db_pool_overflow",
+    "Overflow connections currently open per engine",
+    ("engine",),
+)
+DB_POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "chatbi_db_pool_checkout_seconds",
+    "Time to get a connection from the pool per engine, including opening new ones",
+    ("engine",),
+)
+DB_POOL_EXHAUSTED = metrics.counter(
+    "chatbi_db_pool_exhausted_total",
+    "Checkouts that found every pooled and overflow connection in use and had to wait",
+    ("engine",),
+)
+DB_POOL_TIMEOUTS = metrics.counter(
+    "chatbi_db_pool_timeouts_total",
+    "Checkouts that gave up after the pool timeout",
+    ("engine",),
+)
+DB_POOL_STALE = metrics.counter(
+    "chatbi_db_pool_stale_connections_total",
+    "Idle connections found dead on checkout and replaced",
+    ("engine",),
+)
+HTTP_IN_FLIGHT = metrics.gauge(
+    "chatbi_http_client_in_flight",
+    "Outbound HTTP requests currently in flight per upstream",
+    ("upstream",),
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the duration of a /query pipeline stage in metrics and the request timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        QUERY_STAGE_SECONDS.observe(elapsed, stage=stage)
+        record_timing(stage, elapsed)
+
+
+def record_error(stage: str, error: Optional[BaseException] = None, error_type: Optional[str] = None) -> None:
+    """Count an error for a pipeline stage, keyed by explicit type or exception class"""
+    ERRORS.inc(stage=stage, type=error_type or (type(error).__name__ if error else "unknown"))
+
+
+def register_engine_pool(name: str, engine) -> None:
+    """Expose SQLAlchemy pool utilization for an engine"""
+    pool = engine.pool
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.set_function(pool.size, engine=name)
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set_function(pool.checkedout, engine=name)
+    if hasattr(pool, "overflow"):
+        DB_POOL_OVERFLOW.set_function(lambda: max(pool.overflow(), 0), engine=name)
+
+
+def record_generation_outcome(generation: Dict[str, Any], outcome: str) -> None:
+    """Count how freshly generated SQL fared; SQL from caches is not a generation attempt"""
+    if generation.get("source") == "llm":
+        SQL_GENERATION_OUTCOMES.inc(outcome=outcome, few_shot="true" if generation.get("examples") else "false")
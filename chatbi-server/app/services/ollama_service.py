@@ -1,21 +1,39 @@
 import httpx
 import json
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any
 from config.settings import settings
+from app.services.tracing import tracer
+from app.services.shared_state import llm_semaphore
+from app.services.metrics import (
+    stage_timer, HTTP_IN_FLIGHT, OLLAMA_EVAL_TOKENS, OLLAMA_PROMPT_TOKENS,
+    OLLAMA_EVAL_SECONDS, OLLAMA_PROMPT_EVAL_SECONDS
+)
 
 class OllamaService:
     def __init__(self):
         self.base_url = settings.ollama_base_url
         self.model = settings.ollama_model
+        self._client: Optional[httpx.AsyncClient] = None
     
-    async def generate_response(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        """Generate response using Ollama"""
-        url = f"{self.base_url}/api/generate"
-        
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, so requests reuse connections instead of building a client (and TLS context) each time"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=60.0)
+        return self._client
+    
+    def start(self) -> None:
+        self.client()
+    
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _payload(self, prompt: str, system_prompt: Optional[str], stream: bool) -> Dict[str, Any]:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": 0.1,  # Low temperature for more consistent SQL generation
                 "top_k": 10,
@@ -25,23 +43,82 @@ class OllamaService:
         
         if system_prompt:
             payload["system"] = system_prompt
+        return payload
+    
+    async def generate_response(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Generate response using Ollama"""
+        url = f"{self.base_url}/api/generate"
+        payload = self._payload(prompt, system_prompt, stream=False)
         
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(url, json=payload)
+        with tracer.span("OllamaService.generate_response", **{"llm.model": self.model}) as span:
+            # Host-wide cap on concurrent generations, shared by all workers
+            with stage_timer("llm_queue"):
+                slot = await llm_semaphore.acquire()
+            HTTP_IN_FLIGHT.inc(upstream="ollama")
+            try:
+                response = await self.client().post(url, json=payload)
                 response.raise_for_status()
                 result = response.json()
+                self._record_stats(result)
+                for key in ("eval_count", "prompt_eval_count"):
+                    if key in result:
+                        span.set_attribute(f"llm.{key}", result[key])
                 return result.get("response", "")
-        except Exception as e:
-            raise Exception(f"Ollama service error: {str(e)}")
+            except Exception as e:
+                raise Exception(f"Ollama service error: {str(e)}")
+            finally:
+                HTTP_IN_FLIGHT.dec(upstream="ollama")
+                llm_semaphore.release(slot)
+    
+    async def generate_stream(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Generate with Ollama's streaming API, yielding response text as it arrives"""
+        url = f"{self.base_url}/api/generate"
+        payload = self._payload(prompt, system_prompt, stream=True)
+        
+        with tracer.span("OllamaService.generate_stream", **{"llm.model": self.model}) as span:
+            with stage_timer("llm_queue"):
+                slot = await llm_semaphore.acquire()
+            HTTP_IN_FLIGHT.inc(upstream="ollama")
+            try:
+                async with self.client().stream("POST", url, json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise Exception(chunk["error"])
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            # The final chunk carries the same statistics as a non-streaming response
+                            self._record_stats(chunk)
+                            for key in ("eval_count", "prompt_eval_count"):
+                                if key in chunk:
+                                    span.set_attribute(f"llm.{key}", chunk[key])
+            except Exception as e:
+                raise Exception(f"Ollama service error: {str(e)}")
+            finally:
+                HTTP_IN_FLIGHT.dec(upstream="ollama")
+                llm_semaphore.release(slot)
+    
+    def _record_stats(self, result: Dict[str, Any]) -> None:
+        """Record Ollama's own generation statistics (durations are in nanoseconds)"""
+        if "eval_count" in result:
+            OLLAMA_EVAL_TOKENS.observe(result["eval_count"])
+        if "prompt_eval_count" in result:
+            OLLAMA_PROMPT_TOKENS.observe(result["prompt_eval_count"])
+        if "eval_duration" in result:
+            OLLAMA_EVAL_SECONDS.observe(result["eval_duration"] / 1e9)
+        if "prompt_eval_duration" in result:
+            OLLAMA_PROMPT_EVAL_SECONDS.observe(result["prompt_eval_duration"] / 1e9)
     
     async def check_health(self) -> bool:
         """Check if Ollama service is available"""
         try:
             url = f"{self.base_url}/api/tags"
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(url)
-                return response.status_code == 200
+            response = await self.client().get(url, timeout=5.0)
+            return response.status_code == 200
         except:
             return False
 
@@ -0,0 +1,270 @@
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from config.settings import settings
+from app.services.metrics import metrics
+from app.services.shared_state import private_dir
+
+RATE_LIMITED = metrics.counter(
+    "chatbi_rate_limited_total",
+    "Requests rejected because a client's bucket for the resource was empty",
+    ("resource",),
+)
+
+
+def _refill(state: Optional[Tuple[float, float]], capacity: float, rate: float, now: float) -> float:
+    if state is None:
+        return capacity
+    tokens, updated_at = state
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBuckets:
+    """Process-local token buckets"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Refill, subtract cost (the balance may go negative) and return the new balance; a negative cost refunds"""
+        now = time.time()
+        with self._lock:
+            entry = self._buckets.get(key)
+            # A refund (negative cost) never lifts the balance above capacity
+            tokens = min(capacity, _refill(entry[:2] if entry else None, capacity, rate, now) - cost)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_entries:
+                # Full buckets carry no state; drop those first, then the least recently used
+                for full in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+                    del self._buckets[full]
+                while len(self._buckets) > self.max_entries:
+                    self._buckets.popitem(last=False)
+            return tokens
+
+    def peek(self, key: str, capacity: float, rate: float) -> float:
+        """Current balance without changing it"""
+        with self._lock:
+            entry = self._buckets.get(key)
+            return _refill(entry[:2] if entry else None, capacity, rate, time.time())
+
+
+class SQLiteBuckets:
+    """Token buckets shared by all worker processes through the shared state file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            private_dir(directory)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so concurrent workers serialize per update
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = min(capacity, _refill(row, capacity, rate, now) - cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate),
+            )
+            # Amortized cleanup: a bucket that has refilled completely is the same as no row
+            if random.random() < 0.01:
+                conn.execute("DELETE FROM rate_buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return tokens
+
+    def peek(self, key: str, capacity: float, rate: float) -> float:
+        # A plain read: under WAL it neither takes nor waits for the write lock
+        row = self._conn().execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+        return _refill(row, capacity, rate, time.time())
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, resource: str, retry_after: float, headers: Dict[str, str]):
+        super().__init__(f"Rate limit exceeded for {resource}, retry in {math.ceil(retry_after)}s")
+        self.resource = resource
+        self.retry_after = retry_after
+        self.headers = headers
+
+
+class RateLimiter:
+    """Per-client token buckets for LLM generations, DB execution time and rows returned
+
+    Each resource holds one window's worth of tokens and refills continuously
+    over RATE_LIMIT_WINDOW seconds. An LLM generation costs a known single
+    token, so check() takes it atomically at admission and concurrent requests
+    cannot all pass on the same last token; refund() returns it when no
+    generation happened. DB time and rows are only known after a query ran, so
+    a request is admitted while the client's balance is positive and charged
+    afterwards; an expensive query can leave the balance negative, which then
+    blocks the client until it has refilled.
+
+    check() returns the balances it read and charge() updates them, so the
+    response headers are built without reading the buckets again. With the
+    SQLite backend every call is a blocking file access; `blocking` tells
+    async callers to run them in the threadpool.
+    """
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self.blocking = isinstance(buckets, SQLiteBuckets)
+
+    def limits(self) -> Dict[str, int]:
+        limits = {
+            "llm": settings.rate_limit_llm_generations,
+            "db_ms": settings.rate_limit_db_ms,
+            "rows": settings.rate_limit_rows,
+        }
+        return {resource: limit for resource, limit in limits.items() if limit > 0}
+
+    def client_key(self, headers: Mapping[str, str], client_host: Optional[str]) -> Optional[str]:
+        """Bucket owner for a request: its API key if allowlisted, else its IP; None when disabled
+
+        Only keys whose SHA-256 digest is in RATE_LIMIT_API_KEYS count, so
+        inventing keys cannot mint fresh buckets. Behind proxies, the client
+        address is the X-Forwarded-For entry added by the outermost of the
+        RATE_LIMIT_TRUSTED_PROXIES hops; entries left of it are client-supplied.
+        """
+        if not settings.rate_limit_enabled:
+            return None
+        api_key = headers.get(settings.rate_limit_key_header)
+        if api_key:
+            digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+            allowed = {d.strip().lower() for d in settings.rate_limit_api_keys.split(",") if d.strip()}
+            if digest in allowed:
+                # Never keep the raw key around
+                return "key:" + digest[:16]
+        address = client_host
+        forwarded = headers.get("x-forwarded-for") if settings.rate_limit_trust_forwarded else None
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            if hops:
+                address = hops[-min(max(settings.rate_limit_trusted_proxies, 1), len(hops))]
+        return "ip:" + (address or "unknown")
+
+    def _take(self, client: str, resource: str, cost: float) -> float:
+        limit = self.limits()[resource]
+        return self._buckets.take(f"{client}:{resource}", cost, limit, limit / settings.rate_limit_window)
+
+    def _balances(self, client: str, resources: Iterable[str]) -> Dict[str, float]:
+        limits = self.limits()
+        return {
+            resource: self._buckets.peek(
+                f"{client}:{resource}", limits[resource], limits[resource] / settings.rate_limit_window
+            )
+            for resource in resources if resource in limits
+        }
+
+    def _headers(self, balances: Dict[str, float]) -> Dict[str, str]:
+        """RateLimit-* headers for the tightest resource, with every policy listed"""
+        if not balances:
+            return {}
+        limits = self.limits()
+        window = settings.rate_limit_window
+        resource = min(balances, key=lambda name: balances[name] / limits[name])
+        limit, tokens = limits[resource], balances[resource]
+        return {
+            "RateLimit-Policy": ", ".join(f'{limits[name]};w={int(window)};name="{name}"' for name in balances),
+            "RateLimit-Limit": str(limit),
+            "RateLimit-Remaining": str(max(0, int(tokens))),
+            "RateLimit-Reset": str(math.ceil((limit - tokens) / (limit / window))),
+        }
+
+    def _reject(self, resource: str, balances: Dict[str, float]) -> RateLimitExceeded:
+        RATE_LIMITED.inc(resource=resource)
+        retry_after = (1 - balances[resource]) / (self.limits()[resource] / settings.rate_limit_window)
+        headers = self._headers(balances)
+        headers["Retry-After"] = str(math.ceil(retry_after))
+        return RateLimitExceeded(resource, retry_after, headers)
+
+    def check(self, client: Optional[str], resources: Iterable[str], take: Iterable[str] = ()) -> Dict[str, float]:
+        """The client's balances; raises RateLimitExceeded if any of the resources is used up
+
+        One token of each resource in `take` is taken at admission rather than
+        charged afterwards; it is handed back if the request is rejected.
+        """
+        if client is None:
+            return {}
+        resources = list(dict.fromkeys([*resources, *take]))
+        balances = self._balances(client, resources)
+        for resource, tokens in balances.items():
+            if tokens < 1:
+                raise self._reject(resource, balances)
+        for resource in take:
+            if resource not in balances:
+                continue
+            balances[resource] = self._take(client, resource, 1)
+            if balances[resource] < 0:
+                # Another request took the last token since the read above
+                self._take(client, resource, -1)
+                balances[resource] += 1
+                raise self._reject(resource, balances)
+        return balances
+
+    def charge(self, client: Optional[str], usage: Dict[str, float],
+               balances: Optional[Dict[str, float]] = None) -> None:
+        """Subtract what a request used; `balances` from check() is updated in place"""
+        if client is None:
+            return
+        for resource, amount in usage.items():
+            if amount > 0 and resource in self.limits():
+                tokens = self._take(client, resource, amount)
+                if balances is not None and resource in balances:
+                    balances[resource] = tokens
+
+    def refund(self, client: Optional[str], usage: Dict[str, float],
+               balances: Optional[Dict[str, float]] = None) -> None:
+        """Hand back tokens taken at admission that the request did not use"""
+        if client is None:
+            return
+        for resource, amount in usage.items():
+            if amount > 0 and resource in self.limits():
+                tokens = self._take(client, resource, -amount)
+                if balances is not None and resource in balances:
+                    balances[resource] = tokens
+
+    def headers(self, client: Optional[str], balances: Dict[str, float]) -> Dict[str, str]:
+        """RateLimit-* headers from the balances returned by check()"""
+        if client is None:
+            return {}
+        return self._headers(balances)
+
+
+def _create_buckets():
+    backend = settings.shared_state_backend
+    if backend == "auto":
+        backend = "sqlite" if settings.workers > 1 else "memory"
+    if backend == "sqlite":
+        return SQLiteBuckets(settings.shared_state_path)
+    return MemoryBuckets(settings.cache_max_entries)
+
+
+rate_limiter = RateLimiter(_create_buckets())
@@ -0,0 +1,45 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+from app.services.serialization import dumps
+
+# Send the full result instead once more than this share of the rows changed
+MAX_DELTA_SHARE = 0.5
+# How far rows may have moved as a block (rows added or dropped at the top)
+MAX_SHIFT = 100
+
+
+def result_etag(rows: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    """Content hash of a result, stable across the JSON round trip into query_history"""
+    if rows is None:
+        return None
+    return hashlib.sha1(dumps(rows)).hexdigest()[:20]
+
+
+def _changes(old: List[Dict[str, Any]], new: List[Dict[str, Any]], shift: int) -> List[Tuple[int, Dict[str, Any]]]:
+    """Rows of `new` that differ from `old` moved down by `shift` positions"""
+    return [
+        (index, row) for index, row in enumerate(new)
+        if not 0 <= index - shift < len(old) or old[index - shift] != row
+    ]
+
+
+def row_delta(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Positional row delta turning `old` into `new`, or None when it would not be much smaller
+
+    Rows are compared by position, which suits re-runs of the same ordered
+    report: values change in place, and rows come and go at either end. New
+    rows at the top of a "latest first" report show up as a positive `shift`,
+    and rows dropped from the top as a negative one. The client moves its
+    rows by `shift`, truncates them to `length` and replaces each changed
+    index. Both lists must already be JSON-shaped (see to_jsonable).
+    """
+    shifts = {0}
+    if old and new:
+        shifts.update(s for s in range(1, min(len(new), MAX_SHIFT)) if new[s] == old[0])
+        shifts.update(-s for s in range(1, min(len(old), MAX_SHIFT)) if old[s] == new[0])
+    shift, changes = min(
+        ((s, _changes(old, new, s)) for s in sorted(shifts, key=abs)), key=lambda item: len(item[1])
+    )
+    if len(changes) > len(new) * MAX_DELTA_SHARE:
+        return None
+    return {"length": len(new), "shift": shift, "changes": changes}
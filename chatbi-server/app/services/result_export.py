@@ -0,0 +1,136 @@
+from typing import Any, Iterator, List, Tuple
+from decimal import Decimal
+import csv
+import io
+from app.services.serialization import dumps
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+Batches = Iterator[Tuple[List[str], List[tuple]]]
+
+
+def encode_csv(batches: Batches) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode_jsonl(batches: Batches) -> Iterator[bytes]:
+    for columns, rows in batches:
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(pa, table):
+    """Widen types inferred from the first batch so later batches still fit"""
+    fields = []
+    for field in table.schema:
+        field_type = field.type
+        if pa.types.is_null(field_type):
+            field_type = pa.string()
+        elif pa.types.is_decimal(field_type):
+            field_type = pa.decimal128(38, field_type.scale)
+        elif pa.types.is_integer(field_type):
+            field_type = pa.int64()
+        fields.append(pa.field(field.name, field_type))
+    return pa.schema(fields)
+
+
+def encode_parquet(batches: Batches) -> Iterator[bytes]:
+    """Write one Parquet row group per batch, streaming bytes as each group completes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    columns: List[str] = []
+    string_columns: List[int] = []
+    try:
+        for columns, rows in batches:
+            if not rows:
+                continue
+            if writer is None:
+                first = pa.Table.from_arrays(
+                    [pa.array([row[index] for row in rows]) for index in range(len(columns))],
+                    names=columns,
+                )
+                schema = _parquet_schema(pa, first)
+                # Columns that were all NULL in the first batch are exported as text
+                string_columns = [
+                    index for index, field in enumerate(first.schema) if pa.types.is_null(field.type)
+                ]
+                writer = pq.ParquetWriter(sink, schema)
+            if string_columns:
+                rows = [
+                    tuple(
+                        str(value) if index in string_columns and value is not None else value
+                        for index, value in enumerate(row)
+                    )
+                    for row in rows
+                ]
+            arrays = [pa.array([row[index] for row in rows], type=field.type) for index, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(rows))
+            yield sink.drain()
+        if writer is None:
+            # Empty result: every column as text so the file is still valid
+            writer = pq.ParquetWriter(sink, pa.schema([pa.field(name, pa.string()) for name in columns]))
+        writer.close()
+        writer = None
+        yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def encode_batches(export_format: str, batches: Batches) -> Iterator[bytes]:
+    if export_format == "csv":
+        return encode_csv(batches)
+    if export_format == "jsonl":
+        return encode_jsonl(batches)
+    if export_format == "parquet":
+        return encode_parquet(batches)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
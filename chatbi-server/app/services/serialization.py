@@ -0,0 +1,98 @@
+from typing import Any, Optional
+from datetime import timedelta
+from decimal import Decimal
+import zlib
+import orjson
+
+# orjson only encodes integers in the signed 64-bit range
+_MAX_INT = 2 ** 63
+
+
+def _decimal(value: Decimal) -> Any:
+    """Integral DECIMALs as int, others as float unless that would lose digits, then as str"""
+    if not value.is_finite():
+        return str(value)
+    if value == value.to_integral_value():
+        integer = int(value)
+        return integer if -_MAX_INT <= integer < _MAX_INT else str(integer)
+    as_float = float(value)
+    return as_float if Decimal(repr(as_float)) == value else str(value)
+
+
+# orjson encodes datetime/date/time natively; this covers the remaining driver types
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return _decimal(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, handling Decimal/datetime values straight from the DB driver"""
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def to_jsonable(value: Any) -> Any:
+    """Round-trip through JSON so values compare the way they will after storage"""
+    return orjson.loads(dumps(value))
+
+
+def dumps_str(value: Any) -> str:
+    """dumps() as str, for SQLAlchemy's json_serializer"""
+    return dumps(value).decode("utf-8")
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class StreamCompressor:
+    """Incremental gzip or zstd encoder; every chunk is flushed so streamed bodies stay live"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "zstd":
+            import zstandard
+            self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            # wbits 31 selects the gzip container
+            self._flush_block = zlib.Z_SYNC_FLUSH
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        if final:
+            return output + self._compressor.flush()
+        return output + self._compressor.flush(self._flush_block)
+
+
+def negotiate_encoding(accept_encoding: str, supported: tuple) -> Optional[str]:
+    """Pick the client's highest-q encoding among `supported` (in server preference order)"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,222 @@
+from typing import Any, Optional
+from collections import OrderedDict
+import asyncio
+import fcntl
+import hashlib
+import os
+import random
+import sqlite3
+import stat
+import threading
+import time
+import orjson
+from config.settings import settings
+from app.services.serialization import dumps
+
+
+def cache_key(*parts: Any) -> str:
+    """Build a compact, fixed-length key from arbitrary parts"""
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def private_dir(directory: str) -> None:
+    """Create a directory only the server's user can use, or refuse one someone else controls
+
+    Other local users must not be able to plant entries or lock files that
+    the server then trusts.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise RuntimeError(f"{directory} is owned by another user; set SHARED_STATE_PATH/SHARED_LOCK_DIR elsewhere")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a natural language question for cache lookups and grouping"""
+    question = " ".join(question.lower().split())
+    return question.rstrip("?.!; ")
+
+
+class MemoryStore:
+    """Process-local store; used when only one worker serves requests"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[(namespace, key)] = (value, expires_at)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_namespace(self, namespace: str) -> None:
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[entry_key]
+
+    def get_version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump_version(self, name: str) -> int:
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class SQLiteStore:
+    """Host-wide store in a WAL-mode SQLite file shared by all worker processes
+
+    Values are stored as JSON, so they come back JSON-shaped: Decimal and
+    datetime values in cached rows are returned as numbers and strings.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            private_dir(directory)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        try:
+            return orjson.loads(row[0])
+        except orjson.JSONDecodeError:
+            # Left over from an older encoding; treat as a miss
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, dumps(value), expires_at),
+        )
+        # Amortized cleanup instead of a separate sweeper process
+        if random.random() < 0.01:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM entries WHERE rowid IN ("
+            "SELECT rowid FROM entries ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete_namespace(self, namespace: str) -> None:
+        self._conn().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def get_version(self, name: str) -> int:
+        row = self._conn().execute("SELECT value FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, name: str) -> int:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO versions (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+        return self.get_version(name)
+
+
+class HostSemaphore:
+    """Concurrency limit shared by every process on the host, built on flock'd slot files
+
+    flock locks belong to the open file description, so the same slots also
+    limit concurrent tasks within a single process. A limit of 0 disables it.
+    """
+
+    def __init__(self, name: str, limit: int, lock_dir: str):
+        self.limit = limit
+        self._paths = [os.path.join(lock_dir, f"{name}.{slot}.lock") for slot in range(limit)]
+        if limit:
+            private_dir(lock_dir)
+
+    def _try_acquire(self) -> Optional[int]:
+        for path in random.sample(self._paths, len(self._paths)):
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def try_acquire(self) -> Optional[int]:
+        """Take a slot without waiting; None if all are held (or the limit is 0)"""
+        if not self.limit:
+            return None
+        return self._try_acquire()
+
+    async def acquire(self) -> Optional[int]:
+        if not self.limit:
+            return None
+        delay = 0.005
+        while True:
+            fd = self._try_acquire()
+            if fd is not None:
+                return fd
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def release(self, fd: Optional[int]) -> None:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _create_store():
+    backend = settings.shared_state_backend
+    if backend == "auto":
+        backend = "sqlite" if settings.workers > 1 else "memory"
+    if backend == "sqlite":
+        return SQLiteStore(settings.shared_state_path, settings.cache_max_entries)
+    return MemoryStore(settings.cache_max_entries)
+
+
+shared_store = _create_store()
+llm_semaphore = HostSemaphore("llm", settings.llm_max_concurrency, settings.shared_lock_dir)
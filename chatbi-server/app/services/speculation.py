@@ -0,0 +1,71 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+from app.services.metrics import metrics, stage_timer
+from app.services.sql_generator import sql_generator
+
+SPECULATIVE_EXECUTIONS = metrics.counter(
+    "chatbi_speculative_executions_total",
+    "Executions started while the LLM was still generating, by outcome (used, discarded)",
+    ("outcome",),
+)
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.strip().rstrip(";").split())
+
+
+class SpeculativeExecution:
+    """Executes the first complete statement of a streamed completion before the stream ends
+
+    start() is handed the statement as soon as it is complete; result() gives
+    its execution result if the final SQL is the same statement. Otherwise the
+    speculative run is discarded and result() returns None, so the caller
+    executes the final SQL as usual. A run that already reached the database
+    cannot be stopped, so a discarded run is left to finish and its result is
+    passed to `on_discarded`, which charges the database time it used.
+    """
+
+    def __init__(self, execute: Callable[[str], Awaitable[Dict[str, Any]]],
+                 on_discarded: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._execute = execute
+        self._on_discarded = on_discarded
+        self.sql: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._discarded = False
+
+    def start(self, sql: str) -> None:
+        # Only reads are safe to run before the statement is final
+        if self._task is not None or not sql.lower().startswith("select") or not sql_generator.validate_sql(sql):
+            return
+        self.sql = sql
+        self._task = asyncio.create_task(self._run(sql))
+        # Mark a failure as retrieved in case nobody ends up awaiting the run
+        self._task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _run(self, sql: str) -> Dict[str, Any]:
+        # Overlaps llm_generate; db_execute then only covers the wait left after generation
+        with stage_timer("speculative_execute"):
+            result = await self._execute(sql)
+        if self._discarded:
+            await self._on_discarded(result)
+        return result
+
+    async def result(self, final_sql: str) -> Optional[Dict[str, Any]]:
+        if self._task is None:
+            return None
+        if _normalize(final_sql) != _normalize(self.sql):
+            await self.discard()
+            return None
+        SPECULATIVE_EXECUTIONS.inc(outcome="used")
+        # The caller charges a used run like any other execution
+        task, self._task = self._task, None
+        return await task
+
+    async def discard(self) -> None:
+        """Give up on the run; it is charged through on_discarded once it has finished"""
+        if self._task is None or self._discarded:
+            return
+        self._discarded = True
+        SPECULATIVE_EXECUTIONS.inc(outcome="discarded")
+        if self._task.done() and not self._task.cancelled() and self._task.exception() is None:
+            await self._on_discarded(self._task.result())
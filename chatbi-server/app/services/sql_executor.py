@@ -1,24 +1,118 @@
-from typing import List, Dict, Any, Optional
-from sqlalchemy import text, create_engine
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError, NoSuchTableError
 from sqlalchemy.orm import Session
 from config.settings import settings
+from app.services.datasource import datasource_manager, DataSource
+from app.services.metrics import stage_timer, CACHE_HITS, CACHE_MISSES
+from app.services.shared_state import shared_store, cache_key
+from app.services.tracing import tracer
+from app.services.sql_rewrite import (
+    additive_columns, count_sql, first_table, is_aggregate, paged_sql, sampled_sql, strip_statement
+)
+import asyncio
+import base64
+import hashlib
+import json
 import time
-import pandas as pd
+
+def encode_cursor(sql: str, offset: int) -> str:
+    """Opaque token for the next page of a query's result"""
+    payload = {"offset": offset, "sql": hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sql: str) -> int:
+    """Offset encoded in a cursor; raises ValueError if it is malformed or for another query"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(payload["offset"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("sql") != hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16] or offset < 0:
+        raise ValueError("Cursor does not belong to this query")
+    return offset
 
 class SQLExecutor:
     def __init__(self):
-        self.engine = create_engine(
-            settings.database_url,
-            echo=settings.debug,
-            pool_pre_ping=True,
-            pool_recycle=300
-        )
+        # (datasource, table) -> primary key columns, looked up once per table
+        self._primary_keys: Dict[Tuple[str, str], List[str]] = {}
+    
+    def primary_key(self, sql: str, datasource: Optional[str] = None) -> List[str]:
+        """Primary key columns of the SELECT's first table, or [] if unknown; blocking on first use"""
+        table = first_table(sql)
+        if table is None:
+            return []
+        name = datasource_manager.resolve(datasource)
+        cache_entry = (name, table[0])
+        if cache_entry not in self._primary_keys:
+            schema, _, table_name = table[0].replace("`", "").rpartition(".")
+            try:
+                constraint = inspect(datasource_manager.get(name).primary).get_pk_constraint(
+                    table_name, schema=schema or None
+                )
+                columns = constraint.get("constrained_columns") or []
+            except NoSuchTableError:
+                # e.g. a CTE name
+                columns = []
+            except Exception:
+                # Database unreachable: page unordered and look again next time
+                return []
+            self._primary_keys[cache_entry] = columns
+        return self._primary_keys[cache_entry]
+    
+    def _targets(self, ds: DataSource, sql: str) -> List[Tuple[str, Any]]:
+        """Read-only SQL may go to replicas; anything else runs on the primary"""
+        if sql.lower().strip().startswith('select'):
+            return ds.read_targets()
+        return [("primary", ds.primary)]
     
-    async def execute_query(self, sql: str, limit: int = 1000) -> Dict[str, Any]:
+    def _connect(self, ds: DataSource, sql: str):
+        """Open a connection on the best target, failing over past unreachable replicas"""
+        targets = self._targets(ds, sql)
+        for target, engine in targets:
+            try:
+                return target, engine.connect()
+            except Exception:
+                if target == "primary":
+                    raise
+                ds.mark_down(target)
+        raise Exception(f"No reachable database for datasource {ds.name}")
+    
+    async def execute_query(self, sql: str, limit: int = 1000, datasource: Optional[str] = None) -> Dict[str, Any]:
         """Execute SQL query and return results"""
+        with tracer.span("SQLExecutor.execute_query", **{"db.system": "mysql", "db.statement": sql}) as span:
+            # Short-lived result cache shared by all workers (SELECT only)
+            result_key = None
+            if settings.result_cache_ttl and sql.lower().strip().startswith('select'):
+                result_key = cache_key(datasource_manager.resolve(datasource), sql, limit)
+                cached = shared_store.get("result", result_key)
+                if cached is not None:
+                    CACHE_HITS.inc(cache="result")
+                    span.set_attribute("cache.hit", True)
+                    return {**cached, "cached": True}
+                CACHE_MISSES.inc(cache="result")
+            
+            # Blocking DB I/O: keep it off the event loop so streaming and other requests carry on
+            result = await asyncio.to_thread(self.run_query, sql, limit, datasource)
+            if result_key is not None and result["success"]:
+                shared_store.set("result", result_key, result, ttl=settings.result_cache_ttl)
+            span.set_attribute("db.execution_time_ms", result["execution_time"])
+            if "target" in result:
+                span.set_attribute("db.target", result["target"])
+            if result["success"]:
+                span.set_attribute("db.row_count", result.get("row_count", result.get("affected_rows", 0)))
+            else:
+                span.status = "error"
+                span.error = result["error"]
+            return result
+    
+    def run_query(self, sql: str, limit: int = 1000, datasource: Optional[str] = None) -> Dict[str, Any]:
+        """Execute SQL without the result cache; blocking, so background jobs call it from a thread"""
         start_time = time.time()
         
         try:
+            ds = datasource_manager.get(datasource)
+            
             # Add LIMIT if it's a SELECT query and doesn't already have one
             if sql.lower().strip().startswith('select') and 'limit' not in sql.lower():
                 # Remove trailing semicolon if present
@@ -26,40 +120,22 @@ class SQLExecutor:
                     sql = sql.strip()[:-1]
                 sql += f" LIMIT {limit};"
             
-            with self.engine.connect() as connection:
-                result = connection.execute(text(sql))
-                
-                # Handle different types of queries
-                if sql.lower().strip().startswith('select'):
-                    # For SELECT queries, fetch all results
-                    columns = list(result.keys())
-                    rows = result.fetchall()
-                    
-                    # Convert to list of dictionaries
-                    data = []
-                    for row in rows:
-                        data.append(dict(zip(columns, row)))
-                    
-                    execution_time = int((time.time() - start_time) * 1000)
-                    
-                    return {
-                        "success": True,
-                        "data": data,
-                        "columns": columns,
-                        "row_count": len(data),
-                        "execution_time": execution_time
-                    }
-                else:
-                    # For INSERT, UPDATE, DELETE queries
-                    affected_rows = result.rowcount
-                    execution_time = int((time.time() - start_time) * 1000)
-                    
-                    return {
-                        "success": True,
-                        "affected_rows": affected_rows,
-                        "execution_time": execution_time,
-                        "message": f"Query executed successfully. {affected_rows} rows affected."
-                    }
+            while True:
+                target, connection = self._connect(ds, sql)
+                try:
+                    with connection:
+                        result = self._run(connection, sql)
+                except DBAPIError as e:
+                    # A replica dropped mid-query: retry the read elsewhere
+                    if e.connection_invalidated and target != "primary":
+                        ds.mark_down(target)
+                        continue
+                    raise
+                break
+            
+            result["execution_time"] = int((time.time() - start_time) * 1000)
+            result["target"] = target
+            return result
                     
         except Exception as e:
             execution_time = int((time.time() - start_time) * 1000)
@@ -69,19 +145,177 @@ class SQLExecutor:
                 "execution_time": execution_time
             }
     
-    async def test_connection(self) -> bool:
+    def _run(self, connection, sql: str) -> Dict[str, Any]:
+        result = connection.execute(text(sql))
+        
+        # Handle different types of queries
+        if sql.lower().strip().startswith('select'):
+            # For SELECT queries, fetch all results
+            columns = list(result.keys())
+            rows = result.fetchall()
+            
+            # Convert to list of dictionaries
+            with stage_timer("row_serialization"):
+                data = [dict(zip(columns, row)) for row in rows]
+            
+            return {
+                "success": True,
+                "data": data,
+                "columns": columns,
+                "row_count": len(data)
+            }
+        else:
+            # For INSERT, UPDATE, DELETE queries
+            affected_rows = result.rowcount
+            
+            return {
+                "success": True,
+                "affected_rows": affected_rows,
+                "message": f"Query executed successfully. {affected_rows} rows affected."
+            }
+    
+    async def execute_page(
+        self,
+        sql: str,
+        page_size: int,
+        offset: int = 0,
+        datasource: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        estimate_total: bool = True
+    ) -> Dict[str, Any]:
+        """Execute one page of a SELECT and report whether more rows follow and roughly how many
+        
+        Fetches page_size + 1 rows to detect a further page; only then is the
+        total estimated, so small results cost no extra query. With sample_rate,
+        the first table is sampled and COUNT/SUM columns are scaled back up.
+        Non-SELECT statements run as before.
+        """
+        if not sql.lower().strip().startswith('select'):
+            return await self.execute_query(sql, datasource=datasource)
+        
+        dialect = datasource_manager.get(datasource).primary.dialect.name
+        run_sql = sampled_sql(sql, sample_rate, dialect) if sample_rate else None
+        if run_sql is None:
+            sample_rate, run_sql = None, sql
+        
+        key_columns = await asyncio.to_thread(self.primary_key, sql, datasource)
+        result = await self.execute_query(
+            paged_sql(run_sql, offset, page_size + 1, key_columns), limit=page_size + 1, datasource=datasource
+        )
+        if not result["success"]:
+            return result
+        
+        # Copy: the result may be the object held by the result cache
+        rows = result["data"][:page_size]
+        has_more = len(result["data"]) > page_size
+        result = {
+            **result, "data": rows, "row_count": len(rows), "sample_rate": sample_rate,
+            "next_offset": None, "total_rows": None, "total_rows_kind": None
+        }
+        
+        if sample_rate:
+            # A sample is a one-off preview: no paging, no total
+            for column in additive_columns(sql):
+                rows = [
+                    {**row, column: self._scale(row[column], sample_rate)} if row.get(column) is not None else row
+                    for row in rows
+                ]
+            result.update(data=rows)
+            return result
+        
+        if has_more:
+            result["next_offset"] = offset + page_size
+            if estimate_total:
+                with stage_timer("count_estimate"):
+                    result["total_rows"], result["total_rows_kind"] = await asyncio.to_thread(
+                        self.estimate_total, sql, datasource
+                    )
+        else:
+            result["total_rows"], result["total_rows_kind"] = offset + len(rows), "exact"
+        return result
+    
+    @staticmethod
+    def _scale(value: Any, sample_rate: float) -> Any:
+        scaled = float(value) / sample_rate
+        return int(round(scaled)) if isinstance(value, int) else scaled
+    
+    def estimate_total(self, sql: str, datasource: Optional[str] = None) -> Tuple[Optional[int], Optional[str]]:
+        """(rows, kind) for a SELECT's full result
+        
+        kind is "exact" from a COUNT capped at COUNT_CAP rows, "lower_bound"
+        when the cap was hit, or "estimate" from EXPLAIN when the count failed
+        or hit COUNT_TIMEOUT_MS (MySQL). (None, None) if nothing worked.
+        Aggregates get no EXPLAIN estimate: it counts the rows examined, not
+        the groups returned.
+        """
+        ds = datasource_manager.get(datasource)
+        dialect = ds.primary.dialect.name
+        try:
+            _, connection = self._connect(ds, sql)
+            with connection:
+                total = connection.execute(text(
+                    count_sql(sql, settings.count_cap, dialect, settings.count_timeout_ms)
+                )).scalar()
+            if total > settings.count_cap:
+                return settings.count_cap, "lower_bound"
+            return int(total), "exact"
+        except Exception:
+            pass
+        
+        if dialect != "mysql" or is_aggregate(sql):
+            return None, None
+        try:
+            _, connection = self._connect(ds, sql)
+            with connection:
+                plan = connection.execute(text(f"EXPLAIN {strip_statement(sql)}")).mappings().all()
+            # Nested-loop estimate: rows examined per table times the fraction kept by filters
+            estimate = 1.0
+            for step in plan:
+                if step.get("rows"):
+                    estimate *= float(step["rows"]) * float(step.get("filtered") or 100) / 100
+            return int(estimate), "estimate"
+        except Exception:
+            return None, None
+    
+    def stream_query(
+        self, sql: str, batch_size: int = 5000, datasource: Optional[str] = None
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Execute a SELECT without the preview LIMIT, yielding (columns, rows) batches
+        
+        Uses a server-side cursor so memory stays bounded by batch_size no matter
+        how many rows the query returns. Blocking; iterate it off the event loop.
+        """
+        sql = sql.strip()
+        if sql.endswith(';'):
+            sql = sql[:-1]
+        
+        _, connection = self._connect(datasource_manager.get(datasource), sql)
+        with connection:
+            result = connection.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(text(sql))
+            columns = list(result.keys())
+            empty = True
+            for partition in result.partitions(batch_size):
+                empty = False
+                yield columns, [tuple(row) for row in partition]
+            if empty:
+                # Still report the columns so encoders can write a header/schema
+                yield columns, []
+    
+    async def test_connection(self, datasource: Optional[str] = None) -> bool:
         """Test database connection"""
         try:
-            with self.engine.connect() as connection:
+            with datasource_manager.get(datasource).primary.connect() as connection:
                 connection.execute(text("SELECT 1"))
                 return True
         except:
             return False
     
-    async def get_table_info(self) -> List[Dict[str, Any]]:
+    async def get_table_info(self, datasource: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get information about all tables in the database"""
         try:
-            with self.engine.connect() as connection:
+            with datasource_manager.get(datasource).primary.connect() as connection:
                 # Get table information
                 result = connection.execute(text("""
                     SELECT 
@@ -106,10 +340,12 @@ class SQLExecutor:
         except Exception as e:
             raise Exception(f"Failed to get table information: {str(e)}")
     
-    async def get_column_info(self, table_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def get_column_info(
+        self, table_name: Optional[str] = None, datasource: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """Get column information for all tables or a specific table"""
         try:
-            with self.engine.connect() as connection:
+            with datasource_manager.get(datasource).primary.connect() as connection:
                 query = """
                     SELECT 
                         TABLE_NAME,
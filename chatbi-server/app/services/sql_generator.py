@@ -1,7 +1,14 @@
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.models.database import DatabaseSchema
 from app.services.ollama_service import ollama_service
+from app.services.metrics import stage_timer, CACHE_HITS, CACHE_MISSES
+from app.services.tracing import tracer
+from app.services.shared_state import shared_store, cache_key, normalize_question
+from app.services.few_shot import few_shot_index
+from app.services.datasource import datasource_manager
+from app.services.sql_rewrite import statement_end
+from config.settings import settings
 import re
 import json
 
@@ -24,10 +31,23 @@ Table: table_name
 Columns: column1 (type), column2 (type), ...
 """
     
-    async def get_schema_info(self, db: Session) -> str:
-        """Get database schema information"""
-        schema_records = db.query(DatabaseSchema).all()
+    async def get_schema_info(self, db: Session, datasource: Optional[str] = None) -> str:
+        """Get database schema information, shared across workers until the schema version changes"""
+        datasource = datasource_manager.resolve(datasource)
+        key = cache_key(datasource, shared_store.get_version(f"schema:{datasource}"))
+        schema_info = shared_store.get("schema", key)
+        if schema_info is not None:
+            CACHE_HITS.inc(cache="schema")
+            return schema_info
+        CACHE_MISSES.inc(cache="schema")
         
+        schema_records = db.query(DatabaseSchema).filter(DatabaseSchema.datasource == datasource).all()
+        schema_info = self.format_schema_info(schema_records)
+        shared_store.set("schema", key, schema_info, ttl=settings.schema_cache_ttl)
+        return schema_info
+    
+    def format_schema_info(self, schema_records: List[DatabaseSchema]) -> str:
+        """Format schema records into the prompt's schema section"""
         if not schema_records:
             return "No schema information available"
         
@@ -58,11 +78,14 @@ Columns: column1 (type), column2 (type), ...
         
         return schema_info
     
+    def strip_markdown(self, text: str) -> str:
+        text = re.sub(r'```sql\n?', '', text)
+        return re.sub(r'```\n?', '', text)
+    
     def clean_sql(self, sql: str) -> str:
         """Clean and validate generated SQL"""
         # Remove any markdown formatting
-        sql = re.sub(r'```sql\n?', '', sql)
-        sql = re.sub(r'```\n?', '', sql)
+        sql = self.strip_markdown(sql)
         
         # Remove extra whitespace
         sql = ' '.join(sql.split())
@@ -73,34 +96,107 @@ Columns: column1 (type), column2 (type), ...
         
         return sql
     
-    async def generate_sql(self, natural_query: str, db: Session) -> str:
-        """Generate SQL from natural language query"""
-        try:
-            # Get schema information
-            schema_info = await self.get_schema_info(db)
-            
-            # Construct the prompt
-            prompt = f"""
-{schema_info}
+    def format_examples(self, examples: List[Tuple[str, str]]) -> str:
+        """Format retrieved question/SQL pairs into the prompt's examples section"""
+        if not examples:
+            return ""
+        section = "Examples of questions answered correctly on this database:\n"
+        for question, sql in examples:
+            section += f"\nQuestion: {question}\nSQL: {sql}\n"
+        return section
+    
+    async def _generate_streaming(self, prompt: str, on_statement: Callable[[str], None]) -> str:
+        """Stream the completion, announcing its first statement as soon as it is complete"""
+        text, announced = "", False
+        async for chunk in ollama_service.generate_stream(prompt=prompt, system_prompt=self.system_prompt):
+            text += chunk
+            if not announced:
+                stripped = self.strip_markdown(text)
+                end = statement_end(stripped)
+                if end is not None:
+                    announced = True
+                    on_statement(self.clean_sql(stripped[:end]))
+        return text
+    
+    async def generate_sql(
+        self,
+        natural_query: str,
+        db: Session,
+        datasource: Optional[str] = None,
+        info: Optional[Dict[str, Any]] = None,
+        on_statement: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Generate SQL from natural language query
 
+        If given, `info` is filled with where the SQL came from ("cache" or "llm")
+        and how many few-shot examples the prompt carried. With `on_statement`,
+        the completion is streamed and the first complete statement is passed
+        to it (cleaned) while the model may still be generating.
+        """
+        info = info if info is not None else {}
+        with tracer.span("SQLGenerator.generate_sql", **{"query.length": len(natural_query)}) as span:
+            try:
+                # Reuse SQL generated for the same question against the same schema
+                sql_key = None
+                if settings.sql_cache_ttl:
+                    datasource = datasource_manager.resolve(datasource)
+                    sql_key = cache_key(
+                        datasource,
+                        shared_store.get_version(f"schema:{datasource}"),
+                        normalize_question(natural_query)
+                    )
+                    cached_sql = shared_store.get("sql", sql_key)
+                    if cached_sql is not None:
+                        CACHE_HITS.inc(cache="sql")
+                        span.set_attribute("cache.hit", True)
+                        info.update(source="cache", examples=0)
+                        return cached_sql
+                    CACHE_MISSES.inc(cache="sql")
+                
+                # Get schema information
+                with stage_timer("schema_load"):
+                    schema_info = await self.get_schema_info(db, datasource)
+                
+                # Similar questions that already ran successfully
+                with stage_timer("few_shot_select"):
+                    examples = few_shot_index.select_examples(
+                        db, datasource_manager.resolve(datasource), natural_query
+                    )
+                info.update(source="llm", examples=len(examples))
+                span.set_attribute("prompt.examples", len(examples))
+                
+                # Construct the prompt
+                with stage_timer("prompt_build"):
+                    prompt = f"""
+{schema_info}
+{self.format_examples(examples)}
 Natural Language Query: {natural_query}
 
 Generate a MySQL SQL query for this request:
 """
-            
-            # Generate SQL using Ollama
-            generated_sql = await ollama_service.generate_response(
-                prompt=prompt,
-                system_prompt=self.system_prompt
-            )
-            
-            # Clean the generated SQL
-            clean_sql = self.clean_sql(generated_sql)
-            
-            return clean_sql
-            
-        except Exception as e:
-            raise Exception(f"SQL generation failed: {str(e)}")
+                
+                # Generate SQL using Ollama
+                with stage_timer("llm_generate"):
+                    if on_statement is None:
+                        generated_sql = await ollama_service.generate_response(
+                            prompt=prompt,
+                            system_prompt=self.system_prompt
+                        )
+                    else:
+                        generated_sql = await self._generate_streaming(prompt, on_statement)
+                
+                # Clean the generated SQL
+                clean_sql = self.clean_sql(generated_sql)
+                span.set_attribute("sql.length", len(clean_sql))
+                
+                # Only cache SQL that will pass validation, so bad output gets regenerated
+                if sql_key is not None and self.validate_sql(clean_sql):
+                    shared_store.set("sql", sql_key, clean_sql, ttl=settings.sql_cache_ttl)
+                
+                return clean_sql
+                
+            except Exception as e:
+                raise Exception(f"SQL generation failed: {str(e)}")
     
     def validate_sql(self, sql: str) -> bool:
         """Basic SQL validation"""
@@ -0,0 +1,230 @@
+from typing import List, Optional, Sequence, Tuple
+import re
+
+_TRAILING_LIMIT = re.compile(
+    r"\s+limit\s+(\d+)(?:\s*,\s*(\d+)|\s+offset\s+(\d+))?\s*$", re.IGNORECASE
+)
+# Table named by a top-level FROM, with its optional alias
+_FIRST_TABLE = re.compile(
+    r"from\s+([`\w.]+)"
+    r"(?:\s+(?:as\s+)?(?!(?:where|join|inner|left|right|cross|natural|straight_join|group|order|having|limit|union|on)\b)(`?\w+`?))?",
+    re.IGNORECASE,
+)
+_AGGREGATE = re.compile(r"\b(count|sum|avg|min|max)\s*\(|\bgroup\s+by\b", re.IGNORECASE)
+_TOP_FROM = re.compile(r"\bfrom\b", re.IGNORECASE)
+_TOP_ORDER_BY = re.compile(r"\border\s+by\b", re.IGNORECASE)
+_TOP_SET_OPERATION = re.compile(r"\b(union|intersect|except)\b", re.IGNORECASE)
+
+
+def strip_statement(sql: str) -> str:
+    return sql.strip().rstrip(";").strip()
+
+
+def mask_nested(sql: str) -> str:
+    """Blank out quoted text and everything inside parentheses, keeping positions
+
+    Keywords found in the result are at the top level of the statement, so
+    the FROM in EXTRACT(YEAR FROM d) or in a subquery is not mistaken for the
+    statement's own.
+    """
+    masked, depth, quote = [], 0, None
+    for char in sql:
+        if quote:
+            masked.append(" ")
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+            masked.append(" ")
+        elif char == "(":
+            depth += 1
+            masked.append(char if depth == 1 else " ")
+        elif char == ")":
+            depth -= 1
+            masked.append(char if depth == 0 else " ")
+        else:
+            masked.append(char if depth == 0 else " ")
+    return "".join(masked)
+
+
+def _top_level_from(sql: str) -> Optional[int]:
+    match = _TOP_FROM.search(mask_nested(sql))
+    return match.start() if match else None
+
+
+def split_top_level(expression: str) -> List[str]:
+    """Split on commas that are not inside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in expression:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return parts
+
+
+def select_items(sql: str) -> List[str]:
+    """Top-level expressions of the outermost SELECT list"""
+    base = strip_statement(sql)
+    start = re.match(r"select\s+(?:distinct\s+)?", base, re.IGNORECASE)
+    end = _top_level_from(base)
+    if start is None or end is None:
+        return []
+    return split_top_level(" ".join(base[start.end():end].split()))
+
+
+def is_aggregate(sql: str) -> bool:
+    return bool(_AGGREGATE.search(sql))
+
+
+def _first_table_match(base: str):
+    start = _top_level_from(base)
+    return _FIRST_TABLE.match(base, start) if start is not None else None
+
+
+def first_table(sql: str) -> Optional[Tuple[str, str]]:
+    """(table, alias) of the first table in the top-level FROM; None for a derived table or none"""
+    match = _first_table_match(strip_statement(sql))
+    if match is None:
+        return None
+    table, alias = match.group(1), match.group(2)
+    return table, alias or table.split(".")[-1]
+
+
+def stable_order(sql: str, key_columns: Sequence[str] = ()) -> str:
+    """Order a SELECT without an ORDER BY by its first table's unique key, so pages do not overlap
+
+    Without an ORDER BY the database may return rows in a different order on
+    every run, and LIMIT/OFFSET pages can then skip or repeat rows. Ordering by
+    the primary key walks an index instead of sorting the result on every
+    output column. Left unchanged when no key is known, and for aggregates,
+    DISTINCT and set operations, whose rows the table key does not identify.
+    """
+    base = strip_statement(sql)
+    masked = mask_nested(base)
+    if not key_columns or _TOP_ORDER_BY.search(masked) or _TOP_SET_OPERATION.search(masked):
+        return base
+    if is_aggregate(masked) or re.match(r"select\s+distinct\b", base, re.IGNORECASE):
+        return base
+    table = first_table(base)
+    if table is None:
+        return base
+    alias = table[1]
+    order_by = "ORDER BY " + ", ".join(f"{alias}.{column}" for column in key_columns)
+    match = _TRAILING_LIMIT.search(base)
+    if match is None:
+        return f"{base} {order_by}"
+    return f"{base[:match.start()]} {order_by}{base[match.start():]}"
+
+
+def paged_sql(sql: str, offset: int, limit: int, key_columns: Sequence[str] = ()) -> str:
+    """Restrict a SELECT to rows [offset, offset + limit), staying inside any LIMIT it already has
+
+    key_columns is the first table's primary key, used to order a SELECT that has no ORDER BY.
+    """
+    base = stable_order(sql, key_columns)
+    match = _TRAILING_LIMIT.search(base)
+    if match is None:
+        return f"{base} LIMIT {limit} OFFSET {offset}"
+    if match.group(2) is not None:
+        # MySQL "LIMIT offset, count"
+        inner_offset, inner_count = int(match.group(1)), int(match.group(2))
+    else:
+        inner_offset, inner_count = int(match.group(3) or 0), int(match.group(1))
+    count = max(0, min(limit, inner_count - offset))
+    return f"{base[:match.start()]} LIMIT {count} OFFSET {inner_offset + offset}"
+
+
+def count_sql(sql: str, cap: int, dialect: str, timeout_ms: int) -> str:
+    """COUNT(*) of a SELECT, stopping at cap + 1 rows; MySQL also aborts it after timeout_ms"""
+    hint = f"/*+ MAX_EXECUTION_TIME({timeout_ms}) */ " if dialect == "mysql" else ""
+    return (
+        f"SELECT {hint}COUNT(*) AS total FROM "
+        f"(SELECT 1 AS counted FROM ({strip_statement(sql)}) AS count_source LIMIT {cap + 1}) AS capped"
+    )
+
+
+def sample_predicate(rate: float, dialect: str) -> str:
+    if dialect == "sqlite":
+        return f"ABS(RANDOM()) % 1000000 < {int(rate * 1000000)}"
+    return f"RAND() < {rate}"
+
+
+def sampled_sql(sql: str, rate: float, dialect: str) -> Optional[str]:
+    """Bernoulli-sample the first table in FROM (usually the fact table); None if there is none
+
+    Only that table is sampled: sampling both sides of a join would thin the
+    joined rows by rate squared. A derived table is not sampled, since its
+    rows may already be aggregates.
+    """
+    base = strip_statement(sql)
+    match = _first_table_match(base)
+    if match is None:
+        return None
+    table, alias = first_table(base)
+    sampled = f"FROM (SELECT * FROM {table} WHERE {sample_predicate(rate, dialect)}) AS {alias}"
+    return base[:match.start()] + sampled + base[match.end():]
+
+
+def additive_columns(sql: str) -> List[str]:
+    """Output columns that are COUNT(...) or SUM(...) and so scale with a sample rate"""
+    columns = []
+    for item in select_items(sql):
+        function = re.match(r"^(count|sum)\s*\(", item, re.IGNORECASE)
+        if not function or re.match(r"^count\s*\(\s*distinct\b", item, re.IGNORECASE):
+            # Distinct counts do not grow linearly with the sample
+            continue
+        # The call must span the whole expression: SUM(a) / COUNT(b) does not scale
+        depth, end = 0, None
+        for index in range(function.end() - 1, len(item)):
+            depth += {"(": 1, ")": -1}.get(item[index], 0)
+            if depth == 0:
+                end = index + 1
+                break
+        rest = re.match(r"^(?:\s+(?:as\s+)?`?(\w+)`?)?$", item[end:], re.IGNORECASE) if end else None
+        if rest:
+            columns.append(rest.group(1) or item)
+    return columns
+
+
+def statement_end(text: str) -> Optional[int]:
+    """Index just past the first top-level `;`, or None while the statement is still open
+
+    Semicolons inside quotes, backtick identifiers, comments or parentheses
+    do not count, so a partial LLM completion is only reported complete once
+    its statement really is.
+    """
+    depth, quote, index = 0, None, 0
+    while index < len(text):
+        char = text[index]
+        if quote:
+            if char == "\\" and quote != "`":
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+        elif text.startswith("--", index) or char == "#":
+            newline = text.find("\n", index)
+            if newline == -1:
+                return None
+            index = newline
+        elif text.startswith("/*", index):
+            close = text.find("*/", index + 2)
+            if close == -1:
+                return None
+            index = close + 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == ";" and depth == 0:
+            return index + 1
+        index += 1
+    return None
@@ -0,0 +1,220 @@
+from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import deque
+import json
+import os
+import random
+import threading
+import time
+from config.settings import settings
+
+# Span currently active in this task, used as parent for nested spans
+_current_span: ContextVar[Optional["Span"]] = ContextVar("chatbi_current_span", default=None)
+# Per-request stage timings (milliseconds), installed by the timing middleware
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("chatbi_request_timings", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, str]]:
+    """Parse a W3C traceparent header into trace and parent span ids"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return {"trace_id": parts[1], "span_id": parts[2]}
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id",
+        "start_ns", "end_ns", "attributes", "status", "error",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Encode as an OTLP/JSON span"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error or ""} if self.status == "error" else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans for inspection through the API"""
+
+    def __init__(self, max_spans: int):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        traces: Dict[str, List[Dict[str, Any]]] = {}
+        for span in reversed(list(self.spans)):
+            if span.trace_id not in traces:
+                if len(traces) >= limit:
+                    continue
+                traces[span.trace_id] = []
+            traces[span.trace_id].append(span.to_dict())
+        return [
+            {"trace_id": trace_id, "spans": sorted(spans, key=lambda s: s["start_time_unix_nano"])}
+            for trace_id, spans in traces.items()
+        ]
+
+
+class FileExporter:
+    """Appends spans as OTLP/JSON lines, readable by the collector's otlpjson file receiver"""
+
+    def __init__(self, path: str, service_name: str = "chatbi-server"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", buffering=1, encoding="utf-8")
+        self._lock = threading.Lock()
+        self._resource = {
+            "attributes": [_otlp_attribute("service.name", service_name)]
+        }
+
+    def export(self, span: Span) -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{"scope": {"name": "chatbi"}, "spans": [span.to_otlp()]}],
+            }]
+        }, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+class Tracer:
+    def __init__(self):
+        self.exporters: List[Any] = []
+        self.memory: Optional[InMemoryExporter] = None
+        for name in (item.strip() for item in settings.tracing_exporters.split(",")):
+            if name == "memory":
+                self.memory = InMemoryExporter(settings.tracing_buffer_size)
+                self.exporters.append(self.memory)
+            elif name == "file":
+                self.exporters.append(FileExporter(settings.tracing_file_path))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Dict[str, str]] = None, **attributes: Any):
+        """Open a span as a child of the current span (or of a remote traceparent)"""
+        current = _current_span.get()
+        if current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        elif parent is not None:
+            trace_id, parent_id = parent["trace_id"], parent["span_id"]
+        else:
+            trace_id, parent_id = _new_id(128), None
+        span = Span(name, trace_id, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception:
+                    pass
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_request_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_timing(stage: str, seconds: float) -> None:
+    """Add a stage duration to the current request's timing breakdown"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+
+
+def get_request_timings() -> Optional[Dict[str, float]]:
+    timings = _request_timings.get()
+    return dict(timings) if timings is not None else None
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={duration:.3f}" for stage, duration in timings.items())
+
+
+tracer = Tracer()
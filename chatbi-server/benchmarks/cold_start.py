@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Cold start profile and budget for ChatBI Server
+
+Reports where import time goes (from `python -X importtime`, grouped by
+top-level package), checks that heavy optional packages are not imported by
+`app.main`, then starts the server several times against the SQLite fixture
+and fake Ollama and measures how long it takes until /health/live and
+/health/ready first answer 200. Exits non-zero if a forbidden module is
+imported, or the import or the median time to ready exceeds its budget.
+tests/test_cold_start.py runs the import checks as part of the unit tests.
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 5 --budget-ms 4000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from benchmarks.run_benchmark import SERVER_DIR, free_port, start_server
+from benchmarks.sqlite_fixture import build_fixture
+
+# Median time from process start to /health/ready on a development machine is
+# about 1.5s; the default budget leaves headroom for slower CI machines
+DEFAULT_BUDGET_MS = 4000
+# Importing app.main takes about 1.1s there (2.0s before heavy imports were deferred)
+DEFAULT_IMPORT_BUDGET_MS = 2500
+
+# Packages that must only be imported on the code paths that need them
+DEFAULT_FORBIDDEN = "pandas,langchain,langchain_core,langchain_community,pyarrow,zstandard"
+
+
+def import_profile(env: dict) -> dict:
+    """Self time in ms per top-level package while importing app.main"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    totals = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:"):].split("|")
+        totals[module.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def imported_modules(env: dict) -> set:
+    completed = subprocess.run(
+        [sys.executable, "-c", "import json, sys, app.main; print(json.dumps(sorted(sys.modules)))"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return set(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+
+def time_to_ready(env: dict, timeout: float = 60.0) -> dict:
+    """Milliseconds from spawning the server until live and ready first return 200"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}/api/v1"
+    start = time.perf_counter()
+    server = start_server(port, env)
+    result = {}
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while "ready" not in result:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"Server not ready after {timeout}s")
+                if server.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                for probe in ("live", "ready"):
+                    if probe in result:
+                        continue
+                    try:
+                        if client.get(f"{base_url}/health/{probe}").status_code == 200:
+                            result[probe] = (time.perf_counter() - start) * 1000
+                    except httpx.HTTPError:
+                        break
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile and budget ChatBI Server cold start")
+    parser.add_argument("--runs", type=int, default=3, help="server starts to measure")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail if the median time to /health/ready exceeds this")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                        help="fail if importing app.main takes longer than this")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN,
+                        help="comma-separated packages app.main must not import")
+    parser.add_argument("--top", type=int, default=12, help="packages to show in the import profile")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("🚀 ChatBI Server Cold Start")
+    print("=" * 50)
+
+    workdir = tempfile.mkdtemp(prefix="chatbi-cold-")
+    db_path = os.path.join(workdir, "cold.db")
+    build_fixture(db_path, 0.01)
+    ollama = FakeOllamaServer(FakeOllamaConfig(0.0, 1000.0)).start()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "OLLAMA_BASE_URL": ollama.base_url,
+        "OLLAMA_MODEL": "fake",
+        "DEBUG": "False",
+        "TRACING_EXPORTERS": "",
+    }
+    failed = False
+    try:
+        profile = import_profile(env)
+        total = sum(profile.values())
+        print(f"\nImport time by package (self, ms), total {total:.0f}ms (budget {args.import_budget_ms:.0f}ms):")
+        for package, ms in list(profile.items())[:args.top]:
+            print(f"  {package:28} {ms:>8.1f}")
+        if total > args.import_budget_ms:
+            print("❌ Import over budget")
+            failed = True
+
+        forbidden = {name.strip() for name in args.forbid.split(",") if name.strip()}
+        loaded = sorted(forbidden & {module.split(".")[0] for module in imported_modules(env)})
+        if loaded:
+            print(f"\n❌ Imported at startup: {', '.join(loaded)}")
+            failed = True
+        else:
+            print(f"\n✓ None of {', '.join(sorted(forbidden))} imported at startup")
+
+        runs = [time_to_ready(env) for _ in range(args.runs)]
+        live = statistics.median(run["live"] for run in runs)
+        ready = statistics.median(run["ready"] for run in runs)
+        print(f"\nTime to live:  median {live:.0f}ms over {args.runs} runs")
+        print(f"Time to ready: median {ready:.0f}ms (budget {args.budget_ms:.0f}ms)")
+        if ready > args.budget_ms:
+            print("❌ Cold start over budget")
+            failed = True
+    finally:
+        ollama.stop()
+
+    if failed:
+        sys.exit(1)
+    print("🎉 Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for offline benchmarks
+
+Implements /api/tags and /api/generate (streaming and non-streaming) with a
+configurable prompt latency and token rate. The SQL it answers with is picked
+from BENCHMARK_QUERIES by matching the natural language question embedded in
+the prompt, so the benchmark exercises real execution against the stand-in DB.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Natural language question -> SQL the fake model "generates"
+BENCHMARK_QUERIES = {
+    "How many users are there?":
+        "SELECT COUNT(*) AS user_count FROM users;",
+    "Show me all active users":
+        "SELECT id, username, email, city FROM users WHERE status = 'active' ORDER BY id LIMIT 100;",
+    "What is the total revenue per product category?":
+        "SELECT p.category, SUM(oi.quantity * oi.unit_price) AS revenue "
+        "FROM order_items oi JOIN products p ON p.id = oi.product_id "
+        "GROUP BY p.category ORDER BY revenue DESC;",
+    "Which users placed the most orders?":
+        "SELECT u.username, COUNT(o.id) AS order_count FROM users u "
+        "JOIN orders o ON o.user_id = u.id GROUP BY u.username "
+        "ORDER BY order_count DESC LIMIT 10;",
+    "Show the number of orders per status":
+        "SELECT status, COUNT(*) AS orders FROM orders GROUP BY status;",
+    "List the most recent orders":
+        "SELECT id, user_id, total_amount, order_date, status FROM orders ORDER BY order_date DESC;",
+}
+
+DEFAULT_SQL = "SELECT COUNT(*) AS total FROM orders;"
+
+_QUESTION_RE = re.compile(r"Natural Language Query:\s*(.+)")
+
+
+def answer_for(prompt: str) -> str:
+    match = _QUESTION_RE.search(prompt)
+    question = match.group(1).strip() if match else prompt.strip()
+    return BENCHMARK_QUERIES.get(question, DEFAULT_SQL)
+
+
+def _tokens(text: str):
+    # Roughly word-piece sized chunks, keeping the whitespace with each token
+    return re.findall(r"\S+\s*", text)
+
+
+class FakeOllamaConfig:
+    def __init__(self, prompt_latency: float = 0.2, tokens_per_second: float = 50.0, model: str = "fake",
+                 fenced: bool = False):
+        self.prompt_latency = prompt_latency
+        self.tokens_per_second = tokens_per_second
+        self.model = model
+        # Wrap answers in a ```sql fence, as many models do despite the prompt
+        self.fenced = fenced
+
+
+def make_handler(config: FakeOllamaConfig):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, body, status=200):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": config.model}]})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._send_json({"error": "not found"}, status=404)
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            prompt = payload.get("prompt", "")
+            answer = answer_for(prompt)
+            tokens = _tokens(f"```sql\n{answer}\n```\n" if config.fenced else answer)
+            token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+            started = time.perf_counter()
+            time.sleep(config.prompt_latency)
+            prompt_eval_ns = int((time.perf_counter() - started) * 1e9)
+            stats = {
+                "prompt_eval_count": max(1, len(prompt) // 4),
+                "prompt_eval_duration": prompt_eval_ns,
+                "eval_count": len(tokens),
+            }
+
+            if payload.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                eval_started = time.perf_counter()
+                for token in tokens:
+                    time.sleep(token_delay)
+                    self._write_chunk({"model": config.model, "response": token, "done": False})
+                stats["eval_duration"] = int((time.perf_counter() - eval_started) * 1e9)
+                self._write_chunk({"model": config.model, "response": "", "done": True, **stats})
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                eval_started = time.perf_counter()
+                time.sleep(token_delay * len(tokens))
+                stats["eval_duration"] = int((time.perf_counter() - eval_started) * 1e9)
+                self._send_json({
+                    "model": config.model,
+                    "response": "".join(tokens),
+                    "done": True,
+                    **stats,
+                })
+
+        def _write_chunk(self, body):
+            data = (json.dumps(body) + "\n").encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return FakeOllamaHandler
+
+
+class FakeOllamaServer:
+    """Runs the fake Ollama in a background thread"""
+
+    def __init__(self, config: FakeOllamaConfig, host: str = "127.0.0.1", port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), make_handler(config))
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--prompt-latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--fenced", action="store_true", help="wrap answers in a ```sql code fence")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        FakeOllamaConfig(args.prompt_latency, args.tokens_per_second, fenced=args.fenced),
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Offline load test for ChatBI Server
+
+Runs entirely on one machine with no network access: builds the SQLite
+fixture, starts the fake Ollama, launches the API server in a subprocess
+pointed at both, and drives POST /api/v1/query at one or more concurrency
+levels. Reports p50/p95/p99 per pipeline stage (from the response `timings`)
+and end-to-end, plus throughput, and saves the results as JSON so runs can be
+compared for regressions.
+
+Usage:
+    python -m benchmarks.run_benchmark --concurrency 1,8,32 --requests 200
+    python -m benchmarks.run_benchmark --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks.fake_ollama import BENCHMARK_QUERIES, FakeOllamaConfig, FakeOllamaServer
+from benchmarks.sqlite_fixture import build_fixture
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(SERVER_DIR, "benchmarks", "results")
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    summary = {f"p{pct}": percentile(values, pct) for pct in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["count"] = len(values)
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR,
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(f"{base_url}/")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout}s")
+
+
+async def run_level(base_url: str, concurrency: int, total_requests: int, execute: bool) -> dict:
+    """Send total_requests queries with at most `concurrency` in flight"""
+    questions = list(BENCHMARK_QUERIES)
+    latencies = []
+    stages = {}
+    errors = {}
+    counter = iter(range(total_requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        async def worker():
+            for i in counter:
+                payload = {"query": questions[i % len(questions)], "execute": execute}
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/query", json=payload)
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    key = str(response.status_code)
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+                latencies.append(elapsed_ms)
+                for stage, duration in (response.json().get("timings") or {}).items():
+                    stages.setdefault(stage, []).append(duration)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "wall_time_s": wall_time,
+        "throughput_rps": len(latencies) / wall_time if wall_time else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def print_level(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"\n--- concurrency {result['concurrency']} ---")
+    print(f"requests {result['succeeded']}/{result['requests']}  "
+          f"throughput {result['throughput_rps']:.1f} req/s  errors {result['errors'] or 'none'}")
+    print(f"{'stage':20} {'p50':>10} {'p95':>10} {'p99':>10}")
+    rows = list(result["stages_ms"].items()) + [("end_to_end", latency)]
+    for stage, summary in rows:
+        if not summary["count"]:
+            continue
+        print(f"{stage:20} {summary['p50']:>10.2f} {summary['p95']:>10.2f} {summary['p99']:>10.2f}")
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Print p95 deltas against a baseline run; return False on regression"""
+    print("\n" + "=" * 50)
+    print(f"📊 COMPARISON (p95, threshold +{max_regression:.0%})")
+    print("=" * 50)
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    ok = True
+    for level in current["levels"]:
+        base = baseline_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        rows = [("end_to_end", level["latency_ms"], base["latency_ms"])]
+        rows += [
+            (stage, summary, base["stages_ms"][stage])
+            for stage, summary in level["stages_ms"].items()
+            if stage in base["stages_ms"]
+        ]
+        for stage, now, before in rows:
+            if not now["p95"] or not before["p95"]:
+                continue
+            change = now["p95"] / before["p95"] - 1
+            regressed = change > max_regression
+            ok = ok and not regressed
+            flag = "✗" if regressed else "✓"
+            print(f"{flag} c={level['concurrency']:<4} {stage:20} "
+                  f"{before['p95']:>9.2f} -> {now['p95']:>9.2f} ms ({change:+.1%})")
+        throughput_change = level["throughput_rps"] / base["throughput_rps"] - 1 if base["throughput_rps"] else 0.0
+        print(f"  c={level['concurrency']:<4} throughput {base['throughput_rps']:.1f} -> "
+              f"{level['throughput_rps']:.1f} req/s ({throughput_change:+.1%})")
+    return ok
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="chatbi-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    print(f"Building SQLite fixture (scale {args.scale})...")
+    row_counts = build_fixture(db_path, args.scale)
+    print(f"✓ {row_counts}")
+
+    ollama = FakeOllamaServer(
+        FakeOllamaConfig(args.prompt_latency, args.tokens_per_second, fenced=args.fenced)
+    ).start()
+    port = args.port or free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "OLLAMA_BASE_URL": ollama.base_url,
+        "OLLAMA_MODEL": "fake",
+        "DEBUG": "False",
+        "TRACING_EXPORTERS": "",
+        # Every request should reach the (fake) LLM unless a run asks for the SQL cache
+        "SQL_CACHE_TTL": os.environ.get("SQL_CACHE_TTL", "0"),
+    }
+    server = start_server(port, env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_ready(base_url)
+        print(f"✓ Server ready at {base_url}, fake Ollama at {ollama.base_url}")
+        if args.warmup:
+            await run_level(base_url, 1, args.warmup, args.execute)
+
+        levels = []
+        for concurrency in args.concurrency:
+            result = await run_level(base_url, concurrency, args.requests, args.execute)
+            print_level(result)
+            levels.append(result)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        ollama.stop()
+
+    return {
+        "label": args.label,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "scale": args.scale,
+            "row_counts": row_counts,
+            "requests_per_level": args.requests,
+            "execute": args.execute,
+            "prompt_latency_s": args.prompt_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "fenced": args.fenced,
+            "speculative_execution": os.environ.get("SPECULATIVE_EXECUTION", "False"),
+        },
+        "levels": levels,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for ChatBI Server")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda value: [int(item) for item in value.split(",")],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scale", type=float, default=1.0, help="fixture scale factor")
+    parser.add_argument("--no-execute", dest="execute", action="store_false",
+                        help="only generate SQL, do not execute it")
+    parser.add_argument("--prompt-latency", type=float, default=0.05, help="fake Ollama seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--fenced", action="store_true", help="fake Ollama wraps answers in a ```sql code fence")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--label", default=None, help="name for the saved results file")
+    parser.add_argument("--output", default=RESULTS_DIR)
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative p95 increase before --compare fails")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("🚀 ChatBI Server Benchmark")
+    print("=" * 50)
+    results = asyncio.run(run(args))
+
+    os.makedirs(args.output, exist_ok=True)
+    name = args.label or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.output, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            print("❌ Performance regression detected")
+            sys.exit(1)
+        print("🎉 No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Per-row cost of encoding a /query response
+
+Compares the previous path (QueryResponse validation, FastAPI's
+jsonable_encoder and json.dumps) with FastJSONResponse (orjson, no
+re-validation), then the cost and size of gzip/zstd compression of the result.
+Rows mimic what PyMySQL returns: ints, Decimal, datetime, date and text.
+
+Usage:
+    python -m benchmarks.serialization --rows 1000,10000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.responses import FastJSONResponse
+from app.models.schemas import QueryResponse
+from app.services.serialization import StreamCompressor, zstd_available
+
+
+def make_rows(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i,
+            "username": f"user_{i}",
+            "city": rng.choice(["New York", "Chicago", "Seattle", "Boston"]),
+            "total_amount": Decimal(f"{rng.uniform(5, 5000):.2f}"),
+            "order_count": rng.randint(0, 50),
+            "order_date": base + timedelta(minutes=rng.randint(0, 500000)),
+            "signup_day": date(2023, 1, 1) + timedelta(days=rng.randint(0, 365)),
+        }
+        for i in range(count)
+    ]
+
+
+def make_content(rows):
+    return {
+        "id": 1,
+        "natural_language_query": "Total order amount per user",
+        "generated_sql": "SELECT ...",
+        "execution_result": rows,
+        "execution_time": 12,
+        "status": "executed",
+        "created_at": datetime.utcnow(),
+        "datasource": "default",
+        "timings": {"llm_generate": 800.0, "db_execute": 12.0},
+    }
+
+
+def encode_before(content, field) -> bytes:
+    model = QueryResponse(**content)
+    serialized = asyncio.run(serialize_response(field=field, response_content=model))
+    return JSONResponse(content=serialized).body
+
+
+def encode_after(content) -> bytes:
+    return FastJSONResponse(content=content).body
+
+
+def best_of(repeat: int, fn):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /query response encoding")
+    parser.add_argument("--rows", default="1000,10000",
+                        type=lambda value: [int(item) for item in value.split(",")])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field = create_response_field(name="response", type_=QueryResponse)
+    encodings = ["gzip"] + (["zstd"] if zstd_available() else [])
+
+    print(f"{'rows':>7} {'path':18} {'total ms':>10} {'us/row':>8} {'bytes':>10}")
+    for count in args.rows:
+        content = make_content(make_rows(count))
+        before, body = best_of(args.repeat, lambda: encode_before(content, field))
+        after, fast_body = best_of(args.repeat, lambda: encode_after(content))
+        print(f"{count:>7} {'pydantic+json':18} {before * 1000:>10.2f} {before / count * 1e6:>8.2f} {len(body):>10}")
+        print(f"{count:>7} {'orjson':18} {after * 1000:>10.2f} {after / count * 1e6:>8.2f} {len(fast_body):>10}"
+              f"  ({before / after:.1f}x faster)")
+        for encoding in encodings:
+            level = 6 if encoding == "gzip" else 3
+            elapsed, compressed = best_of(
+                args.repeat, lambda: StreamCompressor(encoding, level).compress(fast_body, final=True)
+            )
+            print(f"{count:>7} {'orjson+' + encoding:18} {(after + elapsed) * 1000:>10.2f} "
+                  f"{(after + elapsed) / count * 1e6:>8.2f} {len(compressed):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+SQLite stand-in for the MySQL database used by offline benchmarks
+
+Creates the init.sql tables (users, products, orders, order_items) scaled up by
+a factor, plus the application's database_schema snapshot so SQL generation
+builds the same prompt it would against MySQL.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+# Rows per table at scale 1
+BASE_ROWS = {
+    "users": 1000,
+    "products": 100,
+    "orders": 10000,
+}
+ITEMS_PER_ORDER = (1, 4)
+
+TABLES = {
+    "users": ("User accounts and profiles", [
+        ("id", "int", "NO", None),
+        ("username", "varchar", "NO", None),
+        ("email", "varchar", "NO", None),
+        ("full_name", "varchar", "YES", None),
+        ("created_at", "timestamp", "YES", None),
+        ("status", "enum", "YES", "active, inactive or suspended"),
+        ("age", "int", "YES", None),
+        ("city", "varchar", "YES", None),
+    ]),
+    "products": ("Product catalog", [
+        ("id", "int", "NO", None),
+        ("name", "varchar", "NO", None),
+        ("category", "varchar", "YES", None),
+        ("price", "decimal", "NO", None),
+        ("stock_quantity", "int", "YES", None),
+        ("created_at", "timestamp", "YES", None),
+        ("description", "text", "YES", None),
+    ]),
+    "orders": ("Customer orders", [
+        ("id", "int", "NO", None),
+        ("user_id", "int", "YES", "references users.id"),
+        ("total_amount", "decimal", "NO", None),
+        ("order_date", "timestamp", "YES", None),
+        ("status", "enum", "YES", "pending, confirmed, shipped, delivered or cancelled"),
+        ("shipping_address", "text", "YES", None),
+    ]),
+    "order_items": ("Individual items in orders", [
+        ("id", "int", "NO", None),
+        ("order_id", "int", "YES", "references orders.id"),
+        ("product_id", "int", "YES", "references products.id"),
+        ("quantity", "int", "NO", None),
+        ("unit_price", "decimal", "NO", None),
+    ]),
+}
+
+DDL = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    full_name VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(20) DEFAULT 'active',
+    age INT,
+    city VARCHAR(50)
+);
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    category VARCHAR(50),
+    price DECIMAL(10,2) NOT NULL,
+    stock_quantity INT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    description TEXT
+);
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY,
+    user_id INT REFERENCES users(id),
+    total_amount DECIMAL(10,2) NOT NULL,
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(20) DEFAULT 'pending',
+    shipping_address TEXT
+);
+CREATE TABLE order_items (
+    id INTEGER PRIMARY KEY,
+    order_id INT REFERENCES orders(id),
+    product_id INT REFERENCES products(id),
+    quantity INT NOT NULL,
+    unit_price DECIMAL(10,2) NOT NULL
+);
+CREATE INDEX idx_orders_user_id ON orders(user_id);
+CREATE INDEX idx_order_items_order_id ON order_items(order_id);
+CREATE INDEX idx_order_items_product_id ON order_items(product_id);
+CREATE TABLE IF NOT EXISTS database_schema (
+    id INTEGER PRIMARY KEY,
+    table_name VARCHAR(255) NOT NULL,
+    column_name VARCHAR(255) NOT NULL,
+    data_type VARCHAR(100) NOT NULL,
+    is_nullable VARCHAR(10) NOT NULL,
+    column_comment TEXT,
+    table_comment TEXT
+);
+"""
+
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Seattle", "Boston", "Denver"]
+CATEGORIES = ["Electronics", "Appliances", "Sports", "Furniture", "Books", "Toys", "Garden"]
+ORDER_STATUSES = ["pending", "confirmed", "shipped", "delivered", "cancelled"]
+
+
+def build_fixture(path: str, scale: float = 1.0, seed: int = 42) -> dict:
+    """Create (or recreate) the SQLite fixture at path and return row counts"""
+    if os.path.exists(path):
+        os.remove(path)
+
+    rng = random.Random(seed)
+    counts = {name: max(1, int(rows * scale)) for name, rows in BASE_ROWS.items()}
+    base_date = datetime(2024, 1, 1)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(DDL)
+
+        conn.executemany(
+            "INSERT INTO users (id, username, email, full_name, created_at, status, age, city) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    i, f"user_{i}", f"user_{i}@example.com", f"User {i}",
+                    (base_date + timedelta(minutes=i)).isoformat(sep=" "),
+                    rng.choice(["active", "active", "active", "inactive", "suspended"]),
+                    rng.randint(18, 80), rng.choice(CITIES),
+                )
+                for i in range(1, counts["users"] + 1)
+            ),
+        )
+
+        prices = {}
+        product_rows = []
+        for i in range(1, counts["products"] + 1):
+            prices[i] = round(rng.uniform(5, 1500), 2)
+            product_rows.append((
+                i, f"Product {i}", rng.choice(CATEGORIES), prices[i],
+                rng.randint(0, 500), base_date.isoformat(sep=" "), f"Description of product {i}",
+            ))
+        conn.executemany(
+            "INSERT INTO products (id, name, category, price, stock_quantity, created_at, description) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            product_rows,
+        )
+
+        item_id = 0
+        order_rows = []
+        item_rows = []
+        for order_id in range(1, counts["orders"] + 1):
+            total = 0.0
+            for _ in range(rng.randint(*ITEMS_PER_ORDER)):
+                item_id += 1
+                product_id = rng.randint(1, counts["products"])
+                quantity = rng.randint(1, 5)
+                item_rows.append((item_id, order_id, product_id, quantity, prices[product_id]))
+                total += quantity * prices[product_id]
+            user_id = rng.randint(1, counts["users"])
+            order_rows.append((
+                order_id, user_id, round(total, 2),
+                (base_date + timedelta(minutes=rng.randint(0, 365 * 24 * 60))).isoformat(sep=" "),
+                rng.choice(ORDER_STATUSES), f"{user_id} Main St",
+            ))
+        conn.executemany(
+            "INSERT INTO orders (id, user_id, total_amount, order_date, status, shipping_address) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            order_rows,
+        )
+        conn.executemany(
+            "INSERT INTO order_items (id, order_id, product_id, quantity, unit_price) VALUES (?, ?, ?, ?, ?)",
+            item_rows,
+        )
+        counts["order_items"] = item_id
+
+        conn.executemany(
+            "INSERT INTO database_schema (table_name, column_name, data_type, is_nullable, "
+            "column_comment, table_comment) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (table_name, column_name, data_type, nullable, comment, table_comment)
+                for table_name, (table_comment, columns) in TABLES.items()
+                for column_name, data_type, nullable, comment in columns
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the SQLite benchmark fixture")
+    parser.add_argument("--path", default="benchmarks/bench.db")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = build_fixture(args.path, args.scale, args.seed)
+    print(f"✓ Fixture written to {args.path}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
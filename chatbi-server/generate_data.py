@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for ChatBI scale testing
+
+Creates N dimension tables x M columns (with table/column comments and foreign
+keys) and fact tables with millions of rows referencing them, so schema-size
+and result-size experiments are reproducible. Rows are generated lazily and
+streamed to the database in multi-row INSERT batches (or LOAD DATA LOCAL
+INFILE chunks on MySQL), so memory stays flat regardless of row count.
+
+Usage:
+    python generate_data.py --tables 50 --columns 20 --fact-tables 2 --fact-rows 5000000
+    python generate_data.py --drop
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from config.settings import settings
+from app.models.database import create_tables, get_engine
+from app.services.datasource import DEFAULT_DATASOURCE
+
+DIM_PREFIX = "syn_dim_"
+FACT_PREFIX = "syn_fact_"
+
+# (name, MySQL type, SQLite type) cycled through for dimension attribute columns
+COLUMN_TYPES = [
+    ("int", "INT", "INTEGER"),
+    ("varchar", "VARCHAR(64)", "VARCHAR(64)"),
+    ("decimal", "DECIMAL(12,2)", "DECIMAL(12,2)"),
+    ("date", "DATE", "DATE"),
+    ("bigint", "BIGINT", "INTEGER"),
+    ("datetime", "DATETIME", "DATETIME"),
+    ("tinyint", "TINYINT(1)", "INTEGER"),
+]
+
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa",
+]
+BASE_DATE = date(2022, 1, 1)
+BASE_DATETIME = datetime(2022, 1, 1)
+
+
+class Column:
+    def __init__(self, name, type_name, mysql_type, sqlite_type, comment, references=None):
+        self.name = name
+        self.type_name = type_name
+        self.mysql_type = mysql_type
+        self.sqlite_type = sqlite_type
+        self.comment = comment
+        self.references = references  # (table, row count) for foreign keys
+
+
+class Table:
+    def __init__(self, name, comment, rows):
+        self.name = name
+        self.comment = comment
+        self.rows = rows
+        self.columns = []
+
+
+def build_layout(args, rng):
+    """Plan table definitions; dimension tables only reference earlier ones"""
+    dims = []
+    for i in range(1, args.tables + 1):
+        table = Table(f"{DIM_PREFIX}{i:04d}", f"Synthetic dimension table {i}", args.dim_rows)
+        table.columns.append(Column("id", "int", "INT", "INTEGER", "Primary key"))
+        if dims:
+            parent = rng.choice(dims)
+            table.columns.append(Column(
+                "parent_id", "int", "INT", "INTEGER",
+                f"References {parent.name}.id", references=(parent.name, parent.rows),
+            ))
+        for j in range(len(table.columns), args.columns):
+            type_name, mysql_type, sqlite_type = COLUMN_TYPES[j % len(COLUMN_TYPES)]
+            table.columns.append(Column(
+                f"attr_{j:03d}_{type_name}", type_name, mysql_type, sqlite_type,
+                f"Synthetic {type_name} attribute {j} ({rng.choice(WORDS)})",
+            ))
+        dims.append(table)
+
+    facts = []
+    for i in range(1, args.fact_tables + 1):
+        table = Table(f"{FACT_PREFIX}{i:04d}", f"Synthetic fact table {i}", args.fact_rows)
+        table.columns.append(Column("id", "bigint", "BIGINT", "INTEGER", "Primary key"))
+        for dim in rng.sample(dims, min(args.fact_dims, len(dims))):
+            table.columns.append(Column(
+                f"{dim.name}_id", "int", "INT", "INTEGER",
+                f"References {dim.name}.id", references=(dim.name, dim.rows),
+            ))
+        table.columns.append(Column("event_date", "date", "DATE", "DATE", "Date of the event"))
+        for j in range(args.fact_measures):
+            if j % 2 == 0:
+                column = Column(f"amount_{j}", "decimal", "DECIMAL(12,2)", "DECIMAL(12,2)", f"Monetary measure {j}")
+            else:
+                column = Column(f"quantity_{j}", "int", "INT", "INTEGER", f"Count measure {j}")
+            table.columns.append(column)
+        facts.append(table)
+
+    return dims, facts
+
+
+def create_table_sql(table, dialect):
+    lines = []
+    for column in table.columns:
+        if dialect == "mysql":
+            line = f"    {column.name} {column.mysql_type}"
+            if column.name == "id":
+                line += " NOT NULL PRIMARY KEY"
+            line += f" COMMENT '{column.comment}'"
+        else:
+            line = f"    {column.name} {column.sqlite_type}"
+            if column.name == "id":
+                line += " PRIMARY KEY"
+        lines.append(line)
+    for column in table.columns:
+        if column.references:
+            lines.append(f"    FOREIGN KEY ({column.name}) REFERENCES {column.references[0]}(id)")
+    sql = f"CREATE TABLE {table.name} (\n" + ",\n".join(lines) + "\n)"
+    if dialect == "mysql":
+        sql += f" COMMENT '{table.comment}'"
+    return sql
+
+
+def value_for(column, row_id, rng):
+    if column.name == "id":
+        return row_id
+    if column.references:
+        # Nullable foreign keys keep a few rows unmatched, like real data
+        return rng.randint(1, column.references[1]) if rng.random() > 0.02 else None
+    if column.type_name in ("int", "bigint"):
+        return rng.randint(0, 100000)
+    if column.type_name == "tinyint":
+        return rng.randint(0, 1)
+    if column.type_name == "decimal":
+        return rng.randint(0, 10_000_000) / 100
+    if column.type_name == "varchar":
+        return f"{rng.choice(WORDS)}_{rng.randint(0, 9999)}"
+    if column.type_name == "date":
+        return (BASE_DATE + timedelta(days=rng.randint(0, 1095))).isoformat()
+    if column.type_name == "datetime":
+        return (BASE_DATETIME + timedelta(seconds=rng.randint(0, 94_608_000))).isoformat(sep=" ")
+    return None
+
+
+def generate_rows(table, rng):
+    for row_id in range(1, table.rows + 1):
+        yield tuple(value_for(column, row_id, rng) for column in table.columns)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_multirow(raw_conn, table, rows, batch_size, placeholder):
+    """Stream rows as multi-row INSERT statements, one transaction per batch"""
+    column_list = ", ".join(column.name for column in table.columns)
+    row_placeholder = "(" + ", ".join([placeholder] * len(table.columns)) + ")"
+    cursor = raw_conn.cursor()
+    inserted = 0
+    for batch in batched(rows, batch_size):
+        sql = f"INSERT INTO {table.name} ({column_list}) VALUES " + ", ".join([row_placeholder] * len(batch))
+        cursor.execute(sql, [value for row in batch for value in row])
+        raw_conn.commit()
+        inserted += len(batch)
+        yield inserted
+    cursor.close()
+
+
+def _tsv_value(value):
+    if value is None:
+        return "\\N"
+    return str(value)
+
+
+def insert_load_data(raw_conn, table, rows, batch_size):
+    """Stream rows through LOAD DATA LOCAL INFILE, one temporary file per batch"""
+    column_list = ", ".join(column.name for column in table.columns)
+    cursor = raw_conn.cursor()
+    inserted = 0
+    for batch in batched(rows, batch_size):
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False) as f:
+            for row in batch:
+                f.write("\t".join(_tsv_value(value) for value in row) + "\n")
+            path = f.name
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table.name} "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})"
+            )
+            raw_conn.commit()
+        finally:
+            os.remove(path)
+        inserted += len(batch)
+        yield inserted
+    cursor.close()
+
+
+def load_table(engine, table, args, rng, dialect):
+    started = time.time()
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        if dialect == "mysql":
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            cursor.execute("SET UNIQUE_CHECKS = 0")
+        cursor.close()
+
+        rows = generate_rows(table, rng)
+        if args.method == "load-data":
+            progress = insert_load_data(raw_conn, table, rows, args.batch_size)
+        else:
+            placeholder = "?" if engine.dialect.dbapi.paramstyle == "qmark" else "%s"
+            batch_size = args.batch_size
+            if dialect == "sqlite":
+                # Stay under SQLite's bound-parameter limit
+                batch_size = max(1, min(batch_size, 32000 // len(table.columns)))
+            progress = insert_multirow(raw_conn, table, rows, batch_size, placeholder)
+
+        inserted = 0
+        report_every = max(table.rows // 10, 1)
+        next_report = report_every
+        for inserted in progress:
+            if inserted >= next_report and table.rows >= 100_000:
+                rate = inserted / max(time.time() - started, 1e-9)
+                print(f"    {table.name}: {inserted:,}/{table.rows:,} rows ({rate:,.0f} rows/s)")
+                next_report += report_every
+    finally:
+        raw_conn.close()
+
+    elapsed = time.time() - started
+    print(f"✓ {table.name}: {table.rows:,} rows in {elapsed:.1f}s ({table.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def drop_synthetic_tables(engine, dialect):
+    with engine.connect() as conn:
+        if dialect == "mysql":
+            names = [row[0] for row in conn.execute(text(
+                "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() "
+                "AND (TABLE_NAME LIKE 'syn\\_dim\\_%' OR TABLE_NAME LIKE 'syn\\_fact\\_%')"
+            ))]
+            conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        else:
+            names = [row[0] for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND (name LIKE 'syn_dim_%' OR name LIKE 'syn_fact_%')"
+            ))]
+        # Facts first so foreign keys never dangle on engines that enforce them
+        for name in sorted(names, key=lambda n: (not n.startswith(FACT_PREFIX), n)):
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        conn.commit()
+    print(f"✓ Dropped {len(names)} synthetic tables")
+
+
+def clear_schema_snapshot(metadata_engine, datasource):
+    with metadata_engine.connect() as conn:
+        conn.execute(
+            text("DELETE FROM database_schema WHERE datasource = :datasource AND table_name LIKE 'syn_%'"),
+            {"datasource": datasource},
+        )
+        conn.commit()
+
+
+def write_schema_snapshot(metadata_engine, datasource, tables):
+    """Record the generated tables in the metadata database's database_schema without INFORMATION_SCHEMA"""
+    clear_schema_snapshot(metadata_engine, datasource)
+    with metadata_engine.connect() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO database_schema (table_name, column_name, data_type, is_nullable, "
+                "column_comment, table_comment, datasource) VALUES (:table_name, :column_name, "
+                ":data_type, :is_nullable, :column_comment, :table_comment, :datasource)"
+            ),
+            [
+                {
+                    "table_name": table.name,
+                    "column_name": column.name,
+                    "data_type": column.type_name,
+                    "is_nullable": "NO" if column.name == "id" else "YES",
+                    "column_comment": column.comment,
+                    "table_comment": table.comment,
+                    "datasource": datasource,
+                }
+                for table in tables
+                for column in table.columns
+            ],
+        )
+        conn.commit()
+    print(f"✓ Schema snapshot updated for {len(tables)} tables in datasource '{datasource}'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic tables and data for scale testing")
+    parser.add_argument("--database-url", default=settings.database_url,
+                        help="analytical database the tables and rows are written to")
+    parser.add_argument("--datasource", default=DEFAULT_DATASOURCE,
+                        help="datasource name the schema snapshot is recorded under in the metadata database")
+    parser.add_argument("--tables", type=int, default=20, help="number of dimension tables")
+    parser.add_argument("--columns", type=int, default=12, help="columns per dimension table")
+    parser.add_argument("--dim-rows", type=int, default=1000, help="rows per dimension table")
+    parser.add_argument("--fact-tables", type=int, default=1)
+    parser.add_argument("--fact-rows", type=int, default=1_000_000, help="rows per fact table")
+    parser.add_argument("--fact-dims", type=int, default=3, help="dimension foreign keys per fact table")
+    parser.add_argument("--fact-measures", type=int, default=4)
+    parser.add_argument("--method", choices=["insert", "load-data"], default="insert",
+                        help="multi-row INSERT, or LOAD DATA LOCAL INFILE (MySQL with local_infile enabled)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per INSERT statement / LOAD DATA file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="drop previously generated tables and exit")
+    parser.add_argument("--no-schema-snapshot", dest="schema_snapshot", action="store_false",
+                        help="do not write the generated tables into database_schema")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dialect = "sqlite" if args.database_url.startswith("sqlite") else "mysql"
+    if args.method == "load-data" and dialect != "mysql":
+        print("✗ --method load-data requires MySQL")
+        sys.exit(1)
+
+    connect_args = {"local_infile": True} if args.method == "load-data" else {}
+    engine = create_engine(args.database_url, connect_args=connect_args)
+
+    print("🚀 ChatBI Synthetic Data Generator")
+    print("=" * 50)
+
+    # The analytical database only receives syn_* tables; database_schema lives in the metadata database
+    if args.schema_snapshot or args.drop:
+        create_tables()
+        clear_schema_snapshot(get_engine(), args.datasource)
+    drop_synthetic_tables(engine, dialect)
+    if args.drop:
+        return
+
+    rng = random.Random(args.seed)
+    dims, facts = build_layout(args, rng)
+
+    with engine.connect() as conn:
+        for table in dims + facts:
+            conn.execute(text(create_table_sql(table, dialect)))
+        conn.commit()
+    print(f"✓ Created {len(dims)} dimension tables x {args.columns} columns and {len(facts)} fact tables")
+
+    for table in dims + facts:
+        load_table(engine, table, args, rng, dialect)
+
+    if args.schema_snapshot:
+        write_schema_snapshot(get_engine(), args.datasource, dims + facts)
+
+    total_rows = sum(table.rows for table in dims + facts)
+    print(f"\n🎉 Generated {total_rows:,} rows across {len(dims) + len(facts)} tables")
+
+
+if __name__ == "__main__":
+    main()
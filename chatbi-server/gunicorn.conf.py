@@ -0,0 +1,14 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+from config.settings import settings
+
+bind = f"{settings.api_host}:{settings.api_port}"
+workers = settings.workers
+worker_class = "uvicorn.workers.UvicornWorker"
+# LLM generations can take a while; keep in line with the Ollama client timeout
+timeout = 120
+graceful_timeout = 30
@@ -7,10 +7,11 @@ import uvicorn
 from config.settings import settings
 
 if __name__ == "__main__":
+    # uvicorn ignores workers when reloading, so reload only applies to single-worker dev runs
     uvicorn.run(
         "app.main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=settings.debug,
-        workers=1
-    )
\ No newline at end of file
+        reload=settings.debug and settings.workers == 1,
+        workers=settings.workers
+    )
@@ -206,7 +206,7 @@ async def test_schema_refresh():
         db = SessionLocal()
         try:
             # Clear existing schema
-            db.query(DatabaseSchema).delete()
+            db.query(DatabaseSchema).filter(DatabaseSchema.datasource == "default").delete()
             
             # Get fresh schema
             columns_info = await sql_executor.get_column_info()
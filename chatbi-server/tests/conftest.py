@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Run from any directory: make `app`, `config` and `benchmarks` importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
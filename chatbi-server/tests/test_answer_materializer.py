@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, MaterializedAnswer
+from app.services import answer_materializer as materializer_module
+from app.services.answer_materializer import AnswerMaterializer, partition_spec
+from app.services.shared_state import cache_key, normalize_question
+from config.settings import settings
+
+DAILY = "SELECT DATE(order_date) AS day, SUM(total) AS revenue FROM orders GROUP BY DATE(order_date) ORDER BY day"
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (DAILY, ("day", False)),
+    ("SELECT DATE(order_date) AS day, COUNT(*) AS n FROM orders GROUP BY day", ("day", False)),
+    ("SELECT `year` AS y, COUNT(*) AS n FROM orders GROUP BY `year` ORDER BY y DESC;", ("y", True)),
+    # Not one row per partition, or not extendable partition by partition
+    (DAILY + " LIMIT 10", None),
+    ("SELECT DATE(order_date), COUNT(*) FROM orders GROUP BY DATE(order_date)", None),
+    ("SELECT status AS s, DATE(order_date) AS day, COUNT(*) AS n FROM orders GROUP BY DATE(order_date)", None),
+    ("SELECT DATE(order_date) AS day, SUM(total) AS revenue FROM orders GROUP BY day ORDER BY revenue", None),
+    ("SELECT DATE(order_date) AS day FROM orders", None),
+])
+def test_partition_spec(sql, expected):
+    assert partition_spec(sql) == expected
+
+
+class FakeExecutor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def run_query(self, sql, limit, datasource):
+        self.queries.append(sql)
+        return {"success": True, "data": self.rows}
+
+
+def answer(**fields):
+    defaults = dict(question_key="k", datasource="default", question="daily revenue", generated_sql=DAILY)
+    return MaterializedAnswer(**{**defaults, **fields})
+
+
+def test_incremental_refresh_merges_from_the_watermark(monkeypatch):
+    now = datetime.utcnow()
+    previous = [
+        {"day": "2024-01-01", "revenue": 10},
+        {"day": "2024-01-02", "revenue": 20},
+        {"day": "2024-01-03", "revenue": 30},
+    ]
+    executor = FakeExecutor([{"day": "2024-01-03", "revenue": 35}, {"day": "2024-01-04", "revenue": 40}])
+    monkeypatch.setattr(materializer_module, "sql_executor", executor)
+    full_at = now - timedelta(hours=1)
+    stored = answer(append_only=True, execution_result=previous, partition_column="day", watermark="2024-01-03",
+                    refreshed_at=full_at, full_refreshed_at=full_at)
+
+    AnswerMaterializer()._refresh(stored, now)
+
+    assert "materialized_base.day >= '2024-01-03'" in executor.queries[0]
+    assert stored.execution_result == [
+        {"day": "2024-01-01", "revenue": 10},
+        {"day": "2024-01-02", "revenue": 20},
+        {"day": "2024-01-03", "revenue": 35},
+        {"day": "2024-01-04", "revenue": 40},
+    ]
+    assert stored.watermark == "2024-01-04"
+    assert stored.refreshed_at == now
+    assert stored.full_refreshed_at == full_at
+
+
+def test_refresh_is_full_unless_append_only(monkeypatch):
+    now = datetime.utcnow()
+    rows = [{"day": "2024-01-01", "revenue": 11}, {"day": "2024-01-02", "revenue": 22}]
+    executor = FakeExecutor(rows)
+    monkeypatch.setattr(materializer_module, "sql_executor", executor)
+    stored = answer(execution_result=[{"day": "2024-01-01", "revenue": 10}], partition_column="day",
+                    watermark="2024-01-01", refreshed_at=now - timedelta(hours=1),
+                    full_refreshed_at=now - timedelta(hours=1))
+
+    AnswerMaterializer()._refresh(stored, now)
+
+    assert executor.queries == [DAILY]
+    assert stored.execution_result == rows
+    assert stored.full_refreshed_at == now
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    monkeypatch.setattr(settings, "materialize_max_staleness", 900)
+    yield session
+    session.close()
+
+
+def test_lookup_judges_kept_partitions_by_the_last_full_refresh(db):
+    now = datetime.utcnow()
+    key = cache_key("default", normalize_question("daily revenue"))
+    stored = answer(question_key=key, execution_result=[], refreshed_at=now,
+                    full_refreshed_at=now - timedelta(hours=2))
+    db.add(stored)
+    db.commit()
+    materializer = AnswerMaterializer()
+
+    assert materializer.lookup(db, "default", "daily revenue") is None
+
+    materializer.set_append_only(db, key, True)
+    assert materializer.lookup(db, "default", "daily revenue") is stored
+    assert materializer.set_append_only(db, "missing", True) is None
@@ -0,0 +1,18 @@
+import os
+
+from benchmarks.cold_start import DEFAULT_FORBIDDEN, DEFAULT_IMPORT_BUDGET_MS, import_profile, imported_modules
+
+# app.main is imported in a fresh interpreter; it must not need a database or Ollama for that
+ENV = {**os.environ, "TRACING_EXPORTERS": "", "DEBUG": "False"}
+
+
+def test_heavy_packages_are_not_imported_at_startup():
+    loaded = {module.split(".")[0] for module in imported_modules(ENV)}
+    assert "app" in loaded
+    assert loaded.isdisjoint(DEFAULT_FORBIDDEN.split(","))
+
+
+def test_import_time_within_budget():
+    # Best of three, so one slow run on a busy machine does not fail the suite
+    total = min(sum(import_profile(ENV).values()) for _ in range(3))
+    assert total <= DEFAULT_IMPORT_BUDGET_MS, f"importing app.main took {total:.0f}ms"
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import exc
+
+from app.models.database import create_db_engine
+from app.services.metrics import DB_POOL_EXHAUSTED, DB_POOL_TIMEOUTS
+
+
+def counter_value(counter, engine):
+    return counter._values.get((engine,), 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}", "pooltest", pool_size=1, max_overflow=1,
+                              pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_exhaustion_counts_only_when_every_connection_is_out(engine):
+    pool = engine.pool
+    before = counter_value(DB_POOL_EXHAUSTED, "pooltest")
+    first = engine.raw_connection()
+    assert not pool.is_exhausted()
+    second = engine.raw_connection()
+    assert pool.is_exhausted()
+    assert counter_value(DB_POOL_EXHAUSTED, "pooltest") == before
+
+    timeouts = counter_value(DB_POOL_TIMEOUTS, "pooltest")
+    with pytest.raises(exc.TimeoutError):
+        engine.raw_connection()
+    assert counter_value(DB_POOL_EXHAUSTED, "pooltest") == before + 1
+    assert counter_value(DB_POOL_TIMEOUTS, "pooltest") == timeouts + 1
+
+    second.close()
+    assert not pool.is_exhausted()
+    first.close()
+
+
+def test_recreated_pool_keeps_its_settings(engine):
+    recreated = engine.pool.recreate()
+    assert recreated.metrics_name == "pooltest"
+    assert recreated.overflow_limit == 1
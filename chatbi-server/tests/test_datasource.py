@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import datasource as datasource_module
+from app.services.datasource import DataSource, DataSourceManager, ReplicaLagMonitor
+
+
+@pytest.fixture
+def ds(tmp_path):
+    return DataSource("test", {
+        "url": f"sqlite:///{tmp_path / 'primary.db'}",
+        "replicas": [f"sqlite:///{tmp_path / 'r1.db'}", f"sqlite:///{tmp_path / 'r2.db'}"],
+        "max_replica_lag": 10,
+    })
+
+
+def names(ds):
+    return [name for name, _ in ds.read_targets()]
+
+
+def test_unmeasured_replicas_are_not_used(ds):
+    assert names(ds) == ["primary"]
+
+
+def test_routing_never_measures_lag(ds, monkeypatch):
+    now = time.time()
+    ds.replicas[0].record_lag(5.0, now)
+    ds.replicas[1].record_lag(1.0, now)
+
+    def fail(engine):
+        raise AssertionError("lag measured on the request path")
+
+    monkeypatch.setattr(datasource_module, "measure_replica_lag", fail)
+    assert names(ds) == ["replica2", "replica1", "primary"]
+
+
+def test_reading_age_counts_towards_lag(ds):
+    ds.replicas[0].record_lag(2.0, time.time() - 20)
+    ds.replicas[1].record_lag(None, time.time())
+    assert names(ds) == ["primary"]
+
+
+def test_mark_down_skips_replica(ds):
+    now = time.time()
+    for replica in ds.replicas:
+        replica.record_lag(0.0, now)
+    ds.mark_down("replica1")
+    assert names(ds) == ["replica2", "primary"]
+
+
+def test_monitor_records_lag(ds, monkeypatch):
+    manager = DataSourceManager()
+    manager._datasources = {"test": ds}
+    lags = iter([3.0, None])
+    monkeypatch.setattr(datasource_module, "measure_replica_lag", lambda engine: next(lags))
+    asyncio.run(ReplicaLagMonitor(manager).run_once())
+    assert [r.lag for r in ds.replicas] == [3.0, None]
+    assert names(ds) == ["replica1", "primary"]
@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, QueryHistory
+from app.services.few_shot import FewShotIndex, estimate_tokens, tokenize
+from config.settings import settings
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(settings, "few_shot_k", 3)
+    monkeypatch.setattr(settings, "few_shot_min_score", 0.0)
+    monkeypatch.setattr(settings, "few_shot_max_tokens", 600)
+    monkeypatch.setattr(settings, "few_shot_index_size", 5000)
+    index = FewShotIndex()
+    index.add("default", "Total revenue per month", "SELECT month, SUM(total) FROM orders GROUP BY month")
+    index.add("default", "Number of customers per city", "SELECT city, COUNT(*) FROM customers GROUP BY city")
+    index.add("default", "Top products by revenue", "SELECT name FROM products ORDER BY revenue DESC")
+    index.add("sales", "Total revenue per month", "SELECT m, SUM(amount) FROM sales GROUP BY m")
+    return index
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("Show me the revenue per month") == ["revenue", "month"]
+
+
+def test_search_ranks_by_overlap_within_the_datasource(index):
+    results = index.search("default", "revenue by month", 3)
+    assert [question for _, question, _ in results] == ["Total revenue per month", "Top products by revenue"]
+    assert results[0][0] > results[1][0]
+    assert index.search("sales", "revenue by month", 3)[0][2].endswith("FROM sales GROUP BY m")
+    assert index.search("default", "the of per", 3) == []
+
+
+def test_same_question_replaces_the_older_sql(index):
+    index.add("default", "total revenue per month?", "SELECT 2")
+    assert len(index) == 4
+    assert index.search("default", "revenue month", 1)[0][1:] == ("total revenue per month?", "SELECT 2")
+    # Document lengths and postings stay consistent after the replacement
+    assert index._total_length == sum(doc[3] for doc in index._docs.values())
+    assert all(len(postings) > 0 for postings in index._postings.values())
+
+
+def test_oldest_entries_are_evicted(index, monkeypatch):
+    monkeypatch.setattr(settings, "few_shot_index_size", 2)
+    index.add("default", "Orders per status", "SELECT status, COUNT(*) FROM orders GROUP BY status")
+    assert len(index) == 2
+    assert index.search("default", "customers city", 3) == []
+
+
+def test_select_examples_stops_at_the_token_budget(index, db, monkeypatch):
+    question, sql = "Total revenue per month", "SELECT month, SUM(total) FROM orders GROUP BY month"
+    monkeypatch.setattr(settings, "few_shot_max_tokens", estimate_tokens(question) + estimate_tokens(sql))
+    assert index.select_examples(db, "default", "revenue per month") == [(question, sql)]
+
+    monkeypatch.setattr(settings, "few_shot_max_tokens", 1)
+    assert index.select_examples(db, "default", "revenue per month") == []
+
+    monkeypatch.setattr(settings, "few_shot_k", 0)
+    monkeypatch.setattr(settings, "few_shot_max_tokens", 600)
+    assert index.select_examples(db, "default", "revenue per month") == []
+
+
+def test_select_examples_skips_weak_matches(index, db, monkeypatch):
+    monkeypatch.setattr(settings, "few_shot_min_score", 100.0)
+    assert index.select_examples(db, "default", "revenue per month") == []
+
+
+def test_refresh_reads_only_rows_past_the_last_id(db, monkeypatch):
+    monkeypatch.setattr(settings, "few_shot_index_size", 5000)
+    db.add_all([
+        QueryHistory(natural_language_query="Revenue per month", generated_sql="SELECT 1", status="executed"),
+        QueryHistory(natural_language_query="Failed question", generated_sql="SELECT x", status="error"),
+        QueryHistory(natural_language_query="Served revenue", generated_sql="SELECT 1", status="materialized"),
+    ])
+    db.commit()
+    index = FewShotIndex()
+    assert index.refresh(db, force=True) == 1
+    assert index.refresh(db) == 0  # within FEW_SHOT_REFRESH_INTERVAL
+
+    db.add(QueryHistory(natural_language_query="Revenue per month", generated_sql="SELECT 2", status="executed"))
+    db.add(QueryHistory(natural_language_query="Customers per city", generated_sql="SELECT 3", status="executed"))
+    db.commit()
+    assert index.refresh(db, force=True) == 2
+    assert index.refresh(db, force=True) == 0
+    assert len(index) == 2
+    assert index.search("default", "revenue month", 1)[0][2] == "SELECT 2"
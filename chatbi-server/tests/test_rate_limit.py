@@ -0,0 +1,86 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from app.services.rate_limit import MemoryBuckets, RateLimiter, RateLimitExceeded, SQLiteBuckets
+from config.settings import settings
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBuckets(str(tmp_path / "state.db"))
+    return MemoryBuckets(100)
+
+
+def test_take_and_peek(buckets):
+    assert buckets.peek("a", 10, 0.001) == 10
+    assert buckets.take("a", 4, 10, 0.001) == pytest.approx(6, abs=0.01)
+    assert buckets.peek("a", 10, 0.001) == pytest.approx(6, abs=0.01)
+    # Charges after the fact may overdraw the bucket
+    assert buckets.take("a", 20, 10, 0.001) < 0
+
+
+def test_sqlite_peek_does_not_write(tmp_path):
+    path = str(tmp_path / "state.db")
+    buckets = SQLiteBuckets(path)
+    buckets.peek("a", 10, 1)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0] == 0
+
+
+def test_refund_never_exceeds_capacity(buckets):
+    assert buckets.take("a", -5, 10, 0.001) == 10
+    buckets.take("a", 3, 10, 0.001)
+    assert buckets.take("a", -1, 10, 0.001) == pytest.approx(8, abs=0.01)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_llm_generations", 2)
+    monkeypatch.setattr(settings, "rate_limit_window", 3600)
+    monkeypatch.setattr(settings, "rate_limit_api_keys", hashlib.sha256(b"known").hexdigest().upper())
+    monkeypatch.setattr(settings, "rate_limit_trust_forwarded", False)
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", 1)
+    return RateLimiter(MemoryBuckets(100))
+
+
+def test_only_allowlisted_api_keys_get_their_own_bucket(limiter):
+    known = limiter.client_key({"X-API-Key": "known"}, "10.0.0.1")
+    assert known == "key:" + hashlib.sha256(b"known").hexdigest()[:16]
+    assert limiter.client_key({"X-API-Key": "made-up"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert limiter.client_key({}, None) == "ip:unknown"
+
+
+def test_forwarded_address_comes_from_the_trusted_hops(limiter, monkeypatch):
+    headers = {"x-forwarded-for": "1.1.1.1, 2.2.2.2, 3.3.3.3"}
+    assert limiter.client_key(headers, "10.0.0.1") == "ip:10.0.0.1"
+    monkeypatch.setattr(settings, "rate_limit_trust_forwarded", True)
+    # The spoofable leftmost entry is never used
+    assert limiter.client_key(headers, "10.0.0.1") == "ip:3.3.3.3"
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", 2)
+    assert limiter.client_key(headers, "10.0.0.1") == "ip:2.2.2.2"
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", 5)
+    assert limiter.client_key(headers, "10.0.0.1") == "ip:1.1.1.1"
+
+
+def test_check_takes_the_llm_token_at_admission(limiter):
+    assert limiter.check("c", (), take=("llm",))["llm"] == pytest.approx(1, abs=0.01)
+    limiter.check("c", (), take=("llm",))
+    with pytest.raises(RateLimitExceeded):
+        limiter.check("c", (), take=("llm",))
+    limiter.refund("c", {"llm": 1})
+    limiter.check("c", (), take=("llm",))
+
+
+def test_concurrent_admissions_cannot_share_the_last_token(limiter, monkeypatch):
+    limiter.check("c", (), take=("llm",))
+    # Both requests read the balance before either took the last token
+    monkeypatch.setattr(limiter, "_balances", lambda client, resources: {"llm": 1.0})
+    limiter.check("c", (), take=("llm",))
+    with pytest.raises(RateLimitExceeded):
+        limiter.check("c", (), take=("llm",))
+    # The losing request's token was handed back, not kept
+    assert limiter._buckets.peek("c:llm", 2, 2 / 3600) == pytest.approx(0, abs=0.01)
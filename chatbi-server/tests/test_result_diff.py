@@ -0,0 +1,81 @@
+from app.services.result_diff import MAX_SHIFT, result_etag, row_delta
+
+
+def rows(*ids):
+    return [{"id": i, "value": i * 10} for i in ids]
+
+
+def apply_delta(current, delta):
+    """What applyRefresh in chatbi-ui/src/components/ResultsDisplay.tsx does with a delta"""
+    shift = delta["shift"]
+    base = [None] * shift + current if shift >= 0 else current[-shift:]
+    # JS arrays grow on assignment past their end; pad to the same effect
+    updated = (base + [None] * delta["length"])[:delta["length"]]
+    for index, row in delta["changes"]:
+        updated[index] = row
+    return updated
+
+
+def test_unchanged():
+    old = rows(1, 2, 3)
+    assert row_delta(old, rows(1, 2, 3)) == {"length": 3, "shift": 0, "changes": []}
+
+
+def test_changes_in_place():
+    old, new = rows(1, 2, 3, 4), rows(1, 2, 3, 4)
+    new[2] = {"id": 3, "value": 99}
+    delta = row_delta(old, new)
+    assert delta == {"length": 4, "shift": 0, "changes": [(2, {"id": 3, "value": 99})]}
+    assert apply_delta(old, delta) == new
+
+
+def test_rows_added_at_top_shift_down():
+    old, new = rows(3, 4, 5, 6), rows(1, 2, 3, 4, 5, 6)
+    delta = row_delta(old, new)
+    assert delta["shift"] == 2
+    assert [index for index, _ in delta["changes"]] == [0, 1]
+    assert apply_delta(old, delta) == new
+
+
+def test_rows_dropped_from_top_shift_up():
+    old, new = rows(1, 2, 3, 4, 5, 6), rows(3, 4, 5, 6)
+    delta = row_delta(old, new)
+    assert delta == {"length": 4, "shift": -2, "changes": []}
+    assert apply_delta(old, delta) == new
+
+
+def test_truncation():
+    old, new = rows(1, 2, 3, 4, 5, 6), rows(1, 2, 3, 4)
+    delta = row_delta(old, new)
+    assert delta == {"length": 4, "shift": 0, "changes": []}
+    assert apply_delta(old, delta) == new
+
+
+def test_rows_appended_at_end():
+    old, new = rows(1, 2, 3, 4), rows(1, 2, 3, 4, 5)
+    delta = row_delta(old, new)
+    assert delta == {"length": 5, "shift": 0, "changes": [(4, {"id": 5, "value": 50})]}
+    assert apply_delta(old, delta) == new
+
+
+def test_falls_back_to_full_result_when_most_rows_changed():
+    old = rows(1, 2, 3, 4)
+    assert row_delta(old, rows(1, 7, 8, 9)) is None
+    # Exactly half changed still fits in a delta
+    assert row_delta(old, rows(1, 2, 8, 9)) is not None
+    assert row_delta([], rows(1, 2)) is None
+    assert row_delta(old, []) == {"length": 0, "shift": 0, "changes": []}
+
+
+def test_shift_is_bounded():
+    old = rows(*range(MAX_SHIFT + 1, MAX_SHIFT + 11))
+    new = rows(*range(1, MAX_SHIFT + 11))
+    # Too far to detect as a shift, and too many changes for a delta
+    assert row_delta(old, new) is None
+
+
+def test_result_etag():
+    assert result_etag(None) is None
+    assert result_etag(rows(1, 2)) == result_etag(rows(1, 2))
+    assert result_etag(rows(1, 2)) != result_etag(rows(2, 1))
+    assert len(result_etag([])) == 20
@@ -0,0 +1,17 @@
+from benchmarks.run_benchmark import percentile, summarize
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile(list(range(1, 11)), 90) == 9
+    assert percentile(list(range(1, 11)), 50) == 5
+    assert percentile(list(range(1, 11)), 99) == 10
+    assert percentile([7], 50) == 7
+    assert percentile([], 50) is None
+
+
+def test_summarize():
+    summary = summarize([3, 1, 2, 4])
+    assert summary["p50"] == 2
+    assert summary["mean"] == 2.5
+    assert summary["count"] == 4
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import orjson
+
+from app.services.serialization import dumps, negotiate_encoding, to_jsonable
+
+
+def test_integral_decimals_stay_integers():
+    assert dumps([Decimal("12"), Decimal("12.00"), Decimal("-3")]) == b"[12,12,-3]"
+
+
+def test_fractional_decimals():
+    assert to_jsonable(Decimal("19.99")) == 19.99
+    assert to_jsonable(Decimal("0.1")) == 0.1
+
+
+def test_decimals_keep_their_digits():
+    assert to_jsonable(Decimal("12345678901234567.89")) == "12345678901234567.89"
+    assert to_jsonable(Decimal("123456789012345678901234567890")) == "123456789012345678901234567890"
+    assert to_jsonable(Decimal("NaN")) == "NaN"
+
+
+def test_driver_types():
+    row = {"at": datetime(2024, 1, 2, 3, 4, 5), "took": timedelta(seconds=90), "raw": b"abc"}
+    assert orjson.loads(dumps(row)) == {"at": "2024-01-02T03:04:05", "took": 90.0, "raw": "abc"}
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, zstd;q=0.5", ("zstd", "gzip")) == "gzip"
+    assert negotiate_encoding("*", ("zstd", "gzip")) == "zstd"
+    assert negotiate_encoding("gzip;q=0, br", ("zstd", "gzip")) is None
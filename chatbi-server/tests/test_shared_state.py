@@ -0,0 +1,53 @@
+import os
+import pickle
+import stat
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.shared_state import MemoryStore, SQLiteStore, normalize_question, private_dir
+
+
+def test_sqlite_store_round_trips_json(tmp_path):
+    store = SQLiteStore(str(tmp_path / "state" / "state.db"), 100)
+    store.set("result", "k", {"data": [{"n": Decimal("12"), "at": datetime(2024, 1, 2)}]}, ttl=60)
+    assert store.get("result", "k") == {"data": [{"n": 12, "at": "2024-01-02T00:00:00"}]}
+    assert store.get("result", "missing") is None
+
+
+def test_sqlite_store_never_unpickles(tmp_path):
+    store = SQLiteStore(str(tmp_path / "state.db"), 100)
+    store._conn().execute(
+        "INSERT INTO entries (namespace, key, value, expires_at) VALUES ('sql', 'k', ?, NULL)",
+        (pickle.dumps({"planted": True}),),
+    )
+    assert store.get("sql", "k") is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    for store in (MemoryStore(10), SQLiteStore(str(tmp_path / "state.db"), 10)):
+        store.set("sql", "k", "SELECT 1", ttl=-1)
+        assert store.get("sql", "k") is None
+
+
+def test_private_dir(tmp_path):
+    directory = tmp_path / "chatbi"
+    private_dir(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    os.chmod(directory, 0o777)
+    private_dir(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="needs root to hand the directory to another user")
+def test_private_dir_refuses_foreign_owner(tmp_path):
+    directory = tmp_path / "planted"
+    directory.mkdir()
+    os.chown(directory, 65534, 65534)
+    with pytest.raises(RuntimeError):
+        private_dir(str(directory))
+
+
+def test_normalize_question():
+    assert normalize_question("  How many  Orders? ") == "how many orders"
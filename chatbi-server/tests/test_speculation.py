@@ -0,0 +1,116 @@
+import asyncio
+
+from app.services.speculation import SpeculativeExecution, _normalize
+from app.services.sql_rewrite import statement_end
+
+SQL = "SELECT status, COUNT(*) AS n FROM orders GROUP BY status"
+
+
+def test_statement_end_waits_for_top_level_semicolon():
+    assert statement_end("SELECT 1") is None
+    assert statement_end("SELECT 1;") == len("SELECT 1;")
+    assert statement_end("SELECT 1; -- done") == len("SELECT 1;")
+
+
+def test_statement_end_ignores_quoted_semicolons():
+    assert statement_end("SELECT * FROM t WHERE a = ';'") is None
+    assert statement_end('SELECT * FROM t WHERE a = "x;y";') == len('SELECT * FROM t WHERE a = "x;y";')
+    assert statement_end("SELECT `a;b` FROM t;") == len("SELECT `a;b` FROM t;")
+    # Escaped quote inside a string
+    assert statement_end("SELECT 'it\\'s;' FROM t") is None
+    assert statement_end("SELECT 'it\\'s;' FROM t;") == len("SELECT 'it\\'s;' FROM t;")
+
+
+def test_statement_end_ignores_comments():
+    assert statement_end("SELECT 1 -- not yet;") is None
+    assert statement_end("SELECT 1 # not yet;\nFROM t;") == len("SELECT 1 # not yet;\nFROM t;")
+    assert statement_end("SELECT /* a; b */ 1") is None
+    assert statement_end("SELECT /* a; b */ 1;") == len("SELECT /* a; b */ 1;")
+    # An unterminated comment may still hide the end
+    assert statement_end("SELECT 1 /* ;") is None
+
+
+def test_statement_end_ignores_nested_parentheses():
+    sql = "SELECT * FROM (SELECT id FROM (SELECT id FROM t) x) y"
+    assert statement_end(sql) is None
+    assert statement_end(sql + ";") == len(sql) + 1
+    assert statement_end("SELECT (1;") is None
+
+
+def test_statement_end_with_trailing_prose():
+    text = "SELECT id FROM t;\n\nThis query lists every id; it is fast."
+    assert text[:statement_end(text)] == "SELECT id FROM t;"
+
+
+def test_normalize():
+    assert _normalize("  SELECT  a,\n b\tFROM t ;") == "SELECT a, b FROM t"
+    assert _normalize("SELECT a FROM t") == _normalize("SELECT a FROM t;")
+    assert _normalize("SELECT a FROM t") != _normalize("SELECT b FROM t")
+
+
+class Recorder:
+    def __init__(self, execution_time=7):
+        self.executed, self.charged = [], []
+        self.execution_time = execution_time
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+        await asyncio.sleep(0)
+        return {"success": True, "data": [], "execution_time": self.execution_time}
+
+    async def on_discarded(self, result):
+        self.charged.append(result["execution_time"])
+
+
+def test_matching_final_sql_uses_the_run():
+    async def scenario():
+        recorder = Recorder()
+        speculation = SpeculativeExecution(recorder.execute, recorder.on_discarded)
+        speculation.start(SQL + ";")
+        result = await speculation.result(SQL)
+        await speculation.discard()
+        return recorder, result
+
+    recorder, result = asyncio.run(scenario())
+    assert result["success"]
+    assert recorder.executed == [SQL + ";"]
+    # Used runs are charged by the caller, not as discarded
+    assert recorder.charged == []
+
+
+def test_mismatch_charges_finished_run():
+    async def scenario():
+        recorder = Recorder()
+        speculation = SpeculativeExecution(recorder.execute, recorder.on_discarded)
+        speculation.start(SQL)
+        await asyncio.sleep(0.01)
+        assert await speculation.result(SQL + " HAVING n > 1") is None
+        return recorder
+
+    assert asyncio.run(scenario()).charged == [7]
+
+
+def test_discarded_run_is_charged_when_it_finishes():
+    async def scenario():
+        recorder = Recorder(execution_time=3)
+        speculation = SpeculativeExecution(recorder.execute, recorder.on_discarded)
+        speculation.start(SQL)
+        await asyncio.sleep(0)
+        await speculation.discard()
+        await speculation.discard()
+        await asyncio.sleep(0.01)
+        return recorder
+
+    assert asyncio.run(scenario()).charged == [3]
+
+
+def test_only_valid_selects_are_started():
+    async def scenario():
+        recorder = Recorder()
+        for sql in ("DELETE FROM orders", "SELECT * FROM orders; DROP TABLE orders"):
+            speculation = SpeculativeExecution(recorder.execute, recorder.on_discarded)
+            speculation.start(sql)
+            assert await speculation.result(sql) is None
+        return recorder
+
+    assert asyncio.run(scenario()).executed == []
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from app.services.sql_executor import SQLExecutor
+from config.settings import settings
+
+
+def test_execute_query_does_not_block_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "result_cache_ttl", 0)
+    executor = SQLExecutor()
+
+    def slow_query(sql, limit, datasource):
+        time.sleep(0.2)
+        return {"success": True, "data": [], "columns": [], "row_count": 0, "execution_time": 200}
+
+    monkeypatch.setattr(executor, "run_query", slow_query)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        result = await executor.execute_query("SELECT 1")
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result["success"]
+    assert ticks >= 5
@@ -0,0 +1,114 @@
+from app.services.sql_rewrite import (
+    additive_columns,
+    count_sql,
+    first_table,
+    is_aggregate,
+    mask_nested,
+    paged_sql,
+    sampled_sql,
+    select_items,
+    stable_order,
+)
+
+
+def test_mask_nested_keeps_positions():
+    sql = "SELECT EXTRACT(YEAR FROM d), 'a (b' FROM t"
+    masked = mask_nested(sql)
+    assert len(masked) == len(sql)
+    assert masked.lower().count("from") == 1
+    assert masked.endswith("FROM t")
+
+
+def test_select_items_ignore_nested_from():
+    sql = "SELECT EXTRACT(YEAR FROM o.order_date) AS y, SUM(o.total_amount) AS total FROM orders o GROUP BY y"
+    assert select_items(sql) == ["EXTRACT(YEAR FROM o.order_date) AS y", "SUM(o.total_amount) AS total"]
+    assert select_items("SELECT DISTINCT status FROM orders") == ["status"]
+    assert select_items("SELECT 1") == []
+
+
+def test_sampled_sql_samples_first_table():
+    sql = "SELECT p.category, SUM(oi.quantity) AS q FROM order_items oi JOIN products p ON p.id = oi.product_id GROUP BY p.category"
+    assert sampled_sql(sql, 0.1, "mysql") == (
+        "SELECT p.category, SUM(oi.quantity) AS q "
+        "FROM (SELECT * FROM order_items WHERE RAND() < 0.1) AS oi "
+        "JOIN products p ON p.id = oi.product_id GROUP BY p.category"
+    )
+    assert sampled_sql("SELECT COUNT(*) FROM orders WHERE status = 'paid'", 0.5, "sqlite") == (
+        "SELECT COUNT(*) FROM (SELECT * FROM orders WHERE ABS(RANDOM()) % 1000000 < 500000) AS orders "
+        "WHERE status = 'paid'"
+    )
+
+
+def test_sampled_sql_skips_functions_using_from():
+    sql = "SELECT EXTRACT(YEAR FROM o.order_date) y, SUM(o.total_amount) FROM orders o GROUP BY y"
+    assert sampled_sql(sql, 0.1, "mysql") == (
+        "SELECT EXTRACT(YEAR FROM o.order_date) y, SUM(o.total_amount) "
+        "FROM (SELECT * FROM orders WHERE RAND() < 0.1) AS o GROUP BY y"
+    )
+    trimmed = "SELECT TRIM(LEADING 'x' FROM name) AS n, COUNT(*) FROM users GROUP BY n"
+    assert "FROM (SELECT * FROM users WHERE RAND() < 0.1) AS users" in sampled_sql(trimmed, 0.1, "mysql")
+    substring = "SELECT SUBSTRING(email FROM 3) AS e, COUNT(*) FROM users u GROUP BY e"
+    assert "SUBSTRING(email FROM 3)" in sampled_sql(substring, 0.1, "mysql")
+
+
+def test_sampled_sql_refuses_derived_tables():
+    sql = "SELECT status, SUM(n) FROM (SELECT status, COUNT(*) AS n FROM orders GROUP BY status) t GROUP BY status"
+    assert sampled_sql(sql, 0.1, "mysql") is None
+    assert sampled_sql("SELECT 1", 0.1, "mysql") is None
+
+
+def test_additive_columns():
+    sql = "SELECT status, COUNT(*) AS n, SUM(a) / COUNT(*) AS avg, COUNT(DISTINCT user_id) AS u, sum(x) FROM t GROUP BY status"
+    assert additive_columns(sql) == ["n", "sum(x)"]
+
+
+def test_is_aggregate():
+    assert is_aggregate("SELECT status, COUNT(*) FROM orders GROUP BY status")
+    assert is_aggregate("SELECT day FROM t GROUP BY day")
+    assert not is_aggregate("SELECT id, total_amount FROM orders")
+
+
+def test_first_table():
+    assert first_table("SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id") == ("orders", "o")
+    assert first_table("SELECT id FROM shop.orders WHERE id > 1") == ("shop.orders", "orders")
+    assert first_table("SELECT id FROM (SELECT id FROM orders) t") is None
+
+
+def test_stable_order_uses_the_first_tables_key():
+    assert stable_order("SELECT id, status FROM orders;", ["id"]) == "SELECT id, status FROM orders ORDER BY orders.id"
+    assert stable_order("SELECT * FROM orders o LIMIT 10", ["id"]) == "SELECT * FROM orders o ORDER BY o.id LIMIT 10"
+    assert stable_order("SELECT o.*, c.name FROM order_items AS o JOIN customers c ON c.id = o.customer_id",
+                        ["order_id", "line"]) == (
+        "SELECT o.*, c.name FROM order_items AS o JOIN customers c ON c.id = o.customer_id "
+        "ORDER BY o.order_id, o.line"
+    )
+    assert stable_order("SELECT id FROM orders ORDER BY id DESC", ["id"]) == "SELECT id FROM orders ORDER BY id DESC"
+    # An ORDER BY inside a subquery does not order the outer result
+    assert stable_order("SELECT id FROM orders WHERE id IN (SELECT id FROM t ORDER BY id LIMIT 5)", ["id"]) == (
+        "SELECT id FROM orders WHERE id IN (SELECT id FROM t ORDER BY id LIMIT 5) ORDER BY orders.id"
+    )
+
+
+def test_stable_order_never_sorts_on_output_columns():
+    assert stable_order("SELECT id, status FROM orders") == "SELECT id, status FROM orders"
+    for sql in [
+        "SELECT status, COUNT(*) FROM orders GROUP BY status",
+        "SELECT DISTINCT status FROM orders",
+        "SELECT id FROM orders UNION SELECT id FROM archived_orders",
+        "SELECT id FROM (SELECT id FROM orders ORDER BY id LIMIT 5) t",
+    ]:
+        assert stable_order(sql, ["id"]) == sql
+
+
+def test_paged_sql():
+    assert paged_sql("SELECT * FROM t", 0, 50) == "SELECT * FROM t LIMIT 50 OFFSET 0"
+    assert paged_sql("SELECT * FROM t LIMIT 120;", 100, 50) == "SELECT * FROM t LIMIT 20 OFFSET 100"
+    assert paged_sql("SELECT * FROM t LIMIT 10, 120", 0, 50) == "SELECT * FROM t LIMIT 50 OFFSET 10"
+    assert paged_sql("SELECT a FROM t", 50, 50, ["id"]) == "SELECT a FROM t ORDER BY t.id LIMIT 50 OFFSET 50"
+
+
+def test_count_sql():
+    assert count_sql("SELECT * FROM t;", 10, "sqlite", 500) == (
+        "SELECT COUNT(*) AS total FROM (SELECT 1 AS counted FROM (SELECT * FROM t) AS count_source LIMIT 11) AS capped"
+    )
+    assert "MAX_EXECUTION_TIME(500)" in count_sql("SELECT * FROM t", 10, "mysql", 500)
@@ -10,6 +10,7 @@ import {
   Box,
   Alert,
   Chip,
+  Tooltip,
   IconButton,
   Drawer,
   List,
@@ -203,11 +204,17 @@ function App() {
             {health && (
               <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
                 <HealthIcon fontSize="small" />
-                <Chip
-                  label={health.status}
-                  color={getHealthColor(health.status) as any}
-                  size="small"
-                />
+                <Tooltip
+                  title={Object.entries(health.checks || {})
+                    .map(([name, check]) => `${name}: ${check.status}${check.error ? ` (${check.error})` : ''}`)
+                    .join(', ')}
+                >
+                  <Chip
+                    label={health.status}
+                    color={getHealthColor(health.status) as any}
+                    size="small"
+                  />
+                </Tooltip>
               </Box>
             )}
           </Toolbar>
@@ -80,6 +80,7 @@ const QueryHistory: React.FC<QueryHistoryProps> = ({ onSelectQuery }) => {
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'executed':
+      case 'materialized':
         return 'success';
       case 'generated':
         return 'info';
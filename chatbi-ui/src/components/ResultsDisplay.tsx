@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Card,
   CardContent,
@@ -13,18 +13,107 @@ import {
   Paper,
   Alert,
   Chip,
+  Button,
+  FormControlLabel,
+  Switch,
 } from '@mui/material';
+import { Refresh as RefreshIcon } from '@mui/icons-material';
 import { DataGrid, GridColDef } from '@mui/x-data-grid';
 import { QueryResponse } from '../types/api';
+import { apiService } from '../services/api';
 
 interface ResultsDisplayProps {
   result: QueryResponse | null;
 }
 
+const formatTotal = (result: QueryResponse) => {
+  if (result.total_rows === null || result.total_rows === undefined) return null;
+  const total = result.total_rows.toLocaleString();
+  if (result.total_rows_kind === 'lower_bound') return `${total}+`;
+  if (result.total_rows_kind === 'estimate') return `~${total}`;
+  return total;
+};
+
+const AUTO_REFRESH_MS = 60000;
+
+type Row = Record<string, any>;
+
+// Patch the rows on screen with a refresh response: a delta moves them by
+// `shift`, trims them to `length` and replaces the changed rows
+const applyRefresh = (current: Row[], fresh: QueryResponse): Row[] => {
+  if (!fresh.delta) return fresh.execution_result ?? [];
+  const { shift, length, changes } = fresh.delta;
+  const base = shift >= 0 ? [...new Array(shift).fill(null), ...current] : current.slice(-shift);
+  const next = base.slice(0, length);
+  changes.forEach(([index, row]) => {
+    next[index] = row;
+  });
+  return next;
+};
+
 const ResultsDisplay: React.FC<ResultsDisplayProps> = ({ result }) => {
+  const [rows, setRows] = useState<Row[]>([]);
+  const [moreRows, setMoreRows] = useState<Row[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [etag, setEtag] = useState<string | null>(null);
+  const [refreshing, setRefreshing] = useState(false);
+  const [refreshedAt, setRefreshedAt] = useState<Date | null>(null);
+  const [autoRefresh, setAutoRefresh] = useState(false);
+
+  useEffect(() => {
+    setRows(result?.execution_result ?? []);
+    setMoreRows([]);
+    setCursor(result?.next_cursor ?? null);
+    setEtag(result?.result_etag ?? null);
+    setRefreshedAt(null);
+  }, [result]);
+
+  // Conditional re-execution: 204 when nothing changed, otherwise a row delta or the full result
+  const refresh = async () => {
+    if (!result || result.id === undefined) return;
+    setRefreshing(true);
+    try {
+      const fresh = await apiService.refreshQueryResult(result.id, etag);
+      if (fresh) {
+        setRows((current) => applyRefresh(current, fresh));
+        setMoreRows([]);
+        setCursor(fresh.next_cursor ?? null);
+        setEtag(fresh.result_etag ?? null);
+      }
+      setRefreshedAt(new Date());
+    } catch (error) {
+      console.error('Failed to refresh results:', error);
+    } finally {
+      setRefreshing(false);
+    }
+  };
+
+  useEffect(() => {
+    if (!autoRefresh) return;
+    const timer = setInterval(refresh, AUTO_REFRESH_MS);
+    return () => clearInterval(timer);
+  }, [autoRefresh, etag, result]);
+
   if (!result || !result.execution_result) return null;
 
-  const data = result.execution_result;
+  const data = [...rows, ...moreRows];
+  const total = formatTotal(result);
+  const refreshable = result.id !== undefined && !result.sample_rate && /^\s*select/i.test(result.generated_sql);
+
+  const loadMore = async () => {
+    if (!cursor || result.id === undefined) return;
+    setLoadingMore(true);
+    try {
+      const page = await apiService.getQueryRows(result.id, cursor);
+      setMoreRows((loaded) => [...loaded, ...page.rows]);
+      setCursor(page.next_cursor ?? null);
+    } catch (error) {
+      console.error('Failed to load more rows:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   
   if (!Array.isArray(data) || data.length === 0) {
     return (
@@ -85,7 +174,7 @@ const ResultsDisplay: React.FC<ResultsDisplayProps> = ({ result }) => {
           </Typography>
           <Box sx={{ display: 'flex', gap: 1 }}>
             <Chip
-              label={`${data.length} rows`}
+              label={total && cursor ? `Showing ${data.length.toLocaleString()} of ${total} rows` : `${data.length} rows`}
               color="primary"
               variant="outlined"
               size="small"
@@ -96,6 +185,28 @@ const ResultsDisplay: React.FC<ResultsDisplayProps> = ({ result }) => {
               variant="outlined"
               size="small"
             />
+            {refreshable && (
+              <>
+                <Button
+                  startIcon={<RefreshIcon />}
+                  onClick={refresh}
+                  disabled={refreshing}
+                  size="small"
+                >
+                  Refresh
+                </Button>
+                <FormControlLabel
+                  control={
+                    <Switch
+                      checked={autoRefresh}
+                      onChange={(event) => setAutoRefresh(event.target.checked)}
+                      size="small"
+                    />
+                  }
+                  label="Auto"
+                />
+              </>
+            )}
           </Box>
         </Box>
 
@@ -119,10 +230,31 @@ const ResultsDisplay: React.FC<ResultsDisplayProps> = ({ result }) => {
           />
         </Box>
 
+        {cursor && (
+          <Box sx={{ mt: 1, display: 'flex', justifyContent: 'center' }}>
+            <Button size="small" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more rows'}
+            </Button>
+          </Box>
+        )}
+
+        {result.sample_rate && (
+          <Alert severity="info" sx={{ mt: 2 }}>
+            Computed on a {Math.round(result.sample_rate * 100)}% sample; counts and sums are scaled up and approximate.
+          </Alert>
+        )}
+
         {result.execution_time && (
           <Box sx={{ mt: 2 }}>
             <Typography variant="caption" color="textSecondary">
               Execution time: {result.execution_time}ms
+              {result.timings && ['db_execute', 'row_serialization', 'history_write']
+                .filter((stage) => result.timings?.[stage] !== undefined)
+                .map((stage) => ` · ${stage.replace(/_/g, ' ')} ${Math.round(result.timings![stage])}ms`)
+                .join('')}
+              {result.materialized_at &&
+                ` · precomputed answer as of ${new Date(result.materialized_at + 'Z').toLocaleString()}`}
+              {refreshedAt && ` · refreshed ${refreshedAt.toLocaleTimeString()}`}
             </Typography>
           </Box>
         )}
@@ -49,6 +49,7 @@ const SqlDisplay: React.FC<SqlDisplayProps> = ({ result, onExecute, executing })
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'executed':
+      case 'materialized':
         return 'success';
       case 'generated':
         return 'info';
@@ -121,6 +122,21 @@ const SqlDisplay: React.FC<SqlDisplayProps> = ({ result, onExecute, executing })
           </Box>
         </Box>
 
+        {result.timings && (
+          <Box sx={{ display: 'flex', flexWrap: 'wrap', gap: 1, mb: 2 }}>
+            {['schema_load', 'prompt_build', 'llm_generate', 'validation']
+              .filter((stage) => result.timings?.[stage] !== undefined)
+              .map((stage) => (
+                <Chip
+                  key={stage}
+                  label={`${stage.replace(/_/g, ' ')}: ${Math.round(result.timings![stage])}ms`}
+                  variant="outlined"
+                  size="small"
+                />
+              ))}
+          </Box>
+        )}
+
         <Alert severity="info" sx={{ mt: 2 }}>
           <Typography variant="body2">
             <strong>Query:</strong> {result.natural_language_query}
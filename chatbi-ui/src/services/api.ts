@@ -4,6 +4,7 @@ import {
   QueryResponse,
   DatabaseSchemaInfo,
   HealthResponse,
+  ResultPage,
   TableInfo
 } from '../types/api';
 
@@ -52,6 +53,21 @@ export const apiService = {
     return response.data;
   },
 
+  async getQueryRows(queryId: number, cursor: string, pageSize?: number): Promise<ResultPage> {
+    const response = await api.get<ResultPage>(`/query/${queryId}/rows`, {
+      params: { cursor, page_size: pageSize }
+    });
+    return response.data;
+  },
+
+  // Re-run a history entry; null when the result still matches etag (204)
+  async refreshQueryResult(queryId: number, etag?: string | null): Promise<QueryResponse | null> {
+    const response = await api.post<QueryResponse>(`/query/${queryId}/refresh`, { etag: etag ?? null }, {
+      validateStatus: (status) => status === 200 || status === 204,
+    });
+    return response.status === 204 ? null : response.data;
+  },
+
   async getQueryHistory(limit = 50, offset = 0): Promise<QueryResponse[]> {
     const response = await api.get<QueryResponse[]>('/history', {
       params: { limit, offset }
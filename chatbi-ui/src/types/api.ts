@@ -1,6 +1,7 @@
 export interface QueryRequest {
   query: string;
   execute: boolean;
+  sample_rate?: number;
 }
 
 export interface QueryResponse {
@@ -11,6 +12,28 @@ export interface QueryResponse {
   execution_time?: number;
   status: string;
   created_at?: string;
+  timings?: Record<string, number> | null;
+  materialized_at?: string | null;
+  total_rows?: number | null;
+  total_rows_kind?: 'exact' | 'lower_bound' | 'estimate' | null;
+  next_cursor?: string | null;
+  sample_rate?: number | null;
+  result_etag?: string | null;
+  delta?: ResultDelta | null;
+}
+
+// Row changes since base_etag; see POST /query/{id}/refresh
+export interface ResultDelta {
+  base_etag: string;
+  length: number;
+  shift: number;
+  changes: [number, Record<string, any>][];
+}
+
+export interface ResultPage {
+  rows: Record<string, any>[];
+  offset: number;
+  next_cursor?: string | null;
 }
 
 export interface DatabaseSchemaInfo {
@@ -22,10 +45,19 @@ export interface DatabaseSchemaInfo {
   table_comment?: string;
 }
 
+export interface DependencyHealth {
+  status: string;
+  latency_ms?: number | null;
+  last_checked?: string | null;
+  last_success?: string | null;
+  error?: string | null;
+}
+
 export interface HealthResponse {
   status: string;
   timestamp: string;
   version: string;
+  checks?: Record<string, DependencyHealth>;
 }
 
 export interface ErrorResponse {